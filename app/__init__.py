@@ -17,7 +17,7 @@ migrate = Migrate()
 cache = Cache()
 
 def create_app(config_name='default'):
-    """Create and configure the Flask application"""
+    """Create and configure the Flask application from a configuration name or class"""
     app = Flask(__name__)
 
     # Select configuration based on environment
@@ -27,11 +27,18 @@ def create_app(config_name='default'):
         'production': ProductionConfig,
         'default': DevelopmentConfig
     }
-    config_class = config_mapping.get(config_name, DevelopmentConfig)
+    if isinstance(config_name, type):
+        config_class = config_name
+    else:
+        config_class = config_mapping.get(config_name, DevelopmentConfig)
 
     app.config.from_object(config_class)
     config_class.init_app(app)
 
+    # Size the connection pool of this worker
+    from app.db_pool import configure_pool, init_pool_stats
+    configure_pool(app)
+
     # Initialize extensions with app
     db.init_app(app)
     login_manager.init_app(app)
@@ -39,6 +46,29 @@ def create_app(config_name='default'):
     migrate.init_app(app, db)
     cache.init_app(app)
 
+    # Apply the SQLite pragma profile to new connections
+    from app.sqlite_pragmas import init_sqlite_pragmas
+    init_sqlite_pragmas(app)
+
+    # Count connection pool events for the pool stats
+    init_pool_stats(app)
+
+    # Log slow queries and count the queries of each request
+    from app.utils.db_utils import init_query_instrumentation
+    init_query_instrumentation(app)
+
+    # Invalidate cached views when pages and tags change
+    from app.caching import init_cache_invalidation
+    init_cache_invalidation(app)
+
+    # Write the buffered page views at the end of requests
+    from app.view_counts import init_view_counts
+    init_view_counts(app)
+
+    # Select the JSON provider used for API responses
+    from app.json_provider import init_json_provider
+    init_json_provider(app)
+
     # Create upload directories
     os.makedirs(os.path.join(app.static_folder, 'uploads', 'image'), exist_ok=True)
     os.makedirs(os.path.join(app.static_folder, 'uploads', 'document'), exist_ok=True)
@@ -54,6 +84,14 @@ def create_app(config_name='default'):
     app.register_blueprint(content, url_prefix='/content')
     app.register_blueprint(api, url_prefix='/api')
 
+    # Limit request rates per blueprint and route
+    from app.ratelimit import init_rate_limiting
+    init_rate_limiting(app)
+
+    # Compress text responses
+    from app.compression import init_compression
+    init_compression(app)
+
     # Register error handlers
     from app.errors import register_error_handlers
     register_error_handlers(app)
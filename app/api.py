@@ -1,11 +1,24 @@
-from flask import Blueprint, jsonify, request, current_app, url_for
+from flask import (Blueprint, jsonify, request, current_app, g, url_for, Response,
+                   stream_with_context)
 from flask_login import current_user
 from werkzeug.security import generate_password_hash
 from functools import wraps
 from datetime import datetime, timezone
+import csv
+import io
 import jwt
-from app import db, cache
-from app.models import User, Page, Tag, Media
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import selectinload
+from app import db
+from app.models import User, Page, Tag, Media, page_tags
+from app.cache_stats import cache_stats
+from app.db_pool import pool_stats
+from app.caching import cached_view, mark_stale, namespace_versions, tag_catalog, user_audience
+from app.utils.http_utils import conditional, make_etag
+from app.utils.pagination_utils import encode_cursor, decode_cursor, get_page_limit
+from app.utils.token_cache import ApiPrincipal, get_token_cache
+from app.view_counts import popular_pages
 
 # Create blueprint
 api = Blueprint('api', __name__)
@@ -25,21 +38,36 @@ def token_required(f):
         if not token:
             return jsonify({'message': 'Token is missing!'}), 401
 
-        try:
-            # Decode token
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
+        # Tokens verified earlier are served from the cache without decoding or a query
+        token_cache = get_token_cache()
+        current_user = token_cache.get(token)
+
+        if current_user is None:
+            try:
+                # Decode token
+                data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+                user = db.session.get(User, data['user_id'])
+            except Exception:
+                return jsonify({'message': 'Token is invalid!'}), 401
 
-            if not current_user:
+            if not user:
                 return jsonify({'message': 'User not found!'}), 401
 
-        except:
-            return jsonify({'message': 'Token is invalid!'}), 401
+            current_user = ApiPrincipal.from_user(user)
+            token_cache.set(token, current_user, data.get('exp', float('inf')))
+
+        if not current_user.is_active:
+            return jsonify({'message': 'User is inactive!'}), 401
 
         return f(current_user, *args, **kwargs)
 
     return decorated
 
+def requested_fields(model):
+    """Get the fields selected by the 'fields' or 'view' query parameters"""
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    return model.resolve_fields(fields, request.args.get('view', 'full'))
+
 @api.route('/token', methods=['POST'])
 def get_token():
     """Generate API token with username/password authentication"""
@@ -72,12 +100,33 @@ def get_token():
 @api.route('/users', methods=['GET'])
 @token_required
 def get_users(current_user):
-    """Get all users (admin only)"""
+    """Get users ordered by id, using keyset pagination (admin only)"""
     if not current_user.is_admin():
         return jsonify({'message': 'Permission denied!'}), 403
 
-    users = User.query.all()
-    return jsonify({'users': [user.to_dict() for user in users]})
+    try:
+        fields = requested_fields(User)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    try:
+        limit = get_page_limit()
+        after = decode_cursor(request.args['after'], int) if 'after' in request.args else None
+    except ValueError:
+        return jsonify({'message': 'Invalid pagination parameters!'}), 400
+
+    query = User.query.options(User.load_fields(fields))
+    if after:
+        query = query.filter(User.id > after[0])
+
+    # Fetch one extra row to find out whether there is a next page
+    users = query.order_by(User.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_cursor(users[-1].id)
+
+    return jsonify({'users': [user.to_dict(fields) for user in users], 'next': next_cursor})
 
 @api.route('/users/<int:user_id>', methods=['GET'])
 @token_required
@@ -87,8 +136,13 @@ def get_user(current_user, user_id):
     if current_user.id != user_id and not current_user.is_admin():
         return jsonify({'message': 'Permission denied!'}), 403
 
-    user = User.query.get_or_404(user_id)
-    return jsonify({'user': user.to_dict()})
+    try:
+        fields = requested_fields(User)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    user = User.query.options(User.load_fields(fields)).get_or_404(user_id)
+    return jsonify({'user': user.to_dict(fields)})
 
 @api.route('/users', methods=['POST'])
 def create_user():
@@ -154,6 +208,9 @@ def update_user(current_user, user_id):
     user.updated_at = datetime.now(timezone.utc)
     db.session.commit()
 
+    # Cached tokens carry the user's role, so they must be verified again
+    get_token_cache().invalidate_user(user.id)
+
     return jsonify({'message': 'User updated successfully!', 'user': user.to_dict()})
 
 @api.route('/users/<int:user_id>', methods=['DELETE'])
@@ -167,28 +224,127 @@ def delete_user(current_user, user_id):
     db.session.delete(user)
     db.session.commit()
 
+    get_token_cache().invalidate_user(user_id)
+
     return jsonify({'message': 'User deleted successfully!'})
 
 # Page endpoints
+def pages_version():
+    """Get the ETag of the published pages collection from its version token"""
+    # The token changes with every commit touching pages, their tags or authors,
+    # so no query is needed to answer revalidations
+    return make_etag(namespace_versions(['pages'])[0]), None
+
+def page_version(page_id):
+    """Get the ETag and Last-Modified values of a published page"""
+    row = db.session.query(Page.updated_at, Page.created_at).filter(
+        Page.id == page_id, Page.is_published.is_(True)).first()
+
+    # Missing and unpublished pages are left to the view
+    if row is None:
+        return None
+
+    # The page token also changes when its tags or author are renamed,
+    # which leaves updated_at untouched
+    last_modified = row.updated_at or row.created_at
+    version = namespace_versions([f'page-id:{page_id}'])[0]
+    return make_etag(page_id, last_modified, version), last_modified
+
 @api.route('/pages', methods=['GET'])
-@cache.cached(timeout=60)  # Cache for 1 minute
+@conditional(pages_version)
+@cached_view(86400, 'pages')  # Cache for 1 day, invalidated on changes
 def get_pages():
-    """Get all published pages"""
-    pages = Page.query.filter_by(is_published=True).all()
-    return jsonify({'pages': [page.to_dict() for page in pages]})
+    """Get published pages, newest first, using keyset pagination"""
+    try:
+        fields = requested_fields(Page)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    try:
+        limit = get_page_limit()
+        after = None
+        if 'after' in request.args:
+            after = decode_cursor(request.args['after'], datetime, int)
+    except ValueError:
+        return jsonify({'message': 'Invalid pagination parameters!'}), 400
+
+    # Only load the selected columns plus the sort key needed for the cursor
+    query = Page.query_for_listing(fields, 'published_at').filter_by(is_published=True)
+
+    # Fetch one extra row to find out whether there is a next page
+    pages = []
+    if after is None or after[0] is not None:
+        pages = _dated_pages(query, after).limit(limit + 1).all()
+    # Pages without a publication date sort last, once the dated ones run out
+    if len(pages) <= limit:
+        pages += _undated_pages(query, after).limit(limit + 1 - len(pages)).all()
+
+    next_cursor = None
+    if len(pages) > limit:
+        pages = pages[:limit]
+        next_cursor = encode_cursor(pages[-1].published_at, pages[-1].id)
+
+    return jsonify({'pages': [page.to_dict(fields) for page in pages], 'next': next_cursor})
+
+@api.route('/pages/popular', methods=['GET'])
+@cached_view(300, 'pages')  # View counts do not invalidate the cache, so keep it short
+def get_popular_pages():
+    """Get the most viewed published pages"""
+    try:
+        fields = requested_fields(Page)
+        limit = get_page_limit()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    pages = popular_pages(limit, fields)
+    return jsonify({'pages': [dict(page.to_dict(fields), views=page.view_count or 0)
+                              for page in pages]})
+
+def _dated_pages(query, after):
+    """Order the dated pages, newest first, after the (published_at, id) cursor"""
+    query = query.filter(Page.published_at.isnot(None))
+    if after:
+        published_at, page_id = after
+        # The range on published_at lets the index seek to the cursor, the id breaks ties
+        query = query.filter(Page.published_at <= published_at,
+                             or_(Page.published_at < published_at, Page.id < page_id))
+    return query.order_by(Page.published_at.desc(), Page.id.desc())
+
+def _undated_pages(query, after):
+    """Order the pages without a publication date by id, after the (None, id) cursor"""
+    query = query.filter(Page.published_at.is_(None))
+    if after and after[0] is None:
+        query = query.filter(Page.id < after[1])
+    return query.order_by(Page.id.desc())
+
+def page_audience(page_id):
+    """Get the audience of a page: everyone if it is published, else the viewer's relation to it"""
+    # conditional() only sets an ETag for published pages
+    if g.get('etag') is not None:
+        return 'public'
+    owner_id = db.session.query(Page.user_id).filter_by(id=page_id).scalar()
+    return user_audience(owner_id)
 
 @api.route('/pages/<int:page_id>', methods=['GET'])
-@cache.cached(timeout=60, query_string=True)  # Cache for 1 minute
+@conditional(page_version)
+# Cache for 1 day per audience, invalidated on changes
+@cached_view(86400, 'page-id:{page_id}', audience=page_audience)
 def get_page(page_id):
     """Get a specific page"""
-    page = Page.query.get_or_404(page_id)
+    try:
+        fields = requested_fields(Page)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    page = Page.query.options(Page.load_fields(fields, 'is_published', 'user_id')) \
+        .get_or_404(page_id)
 
     # If page is not published, only allow author or admin to view
     if not page.is_published:
         if not current_user.is_authenticated or (current_user.id != page.user_id and not current_user.is_admin()):
             return jsonify({'message': 'Page not found!'}), 404
 
-    return jsonify({'page': page.to_dict()})
+    return jsonify({'page': page.to_dict(fields)})
 
 @api.route('/pages', methods=['POST'])
 @token_required
@@ -216,12 +372,8 @@ def create_page(current_user):
 
     # Add tags if provided
     if 'tags' in data and isinstance(data['tags'], list):
-        for tag_name in data['tags']:
-            tag = Tag.query.filter_by(name=tag_name).first()
-            if not tag:
-                tag = Tag(name=tag_name)
-                db.session.add(tag)
-            page.tags.append(tag)
+        tags = resolve_tags(data['tags'])
+        page.tags = list(tags.values())
 
     db.session.add(page)
     db.session.commit()
@@ -259,24 +411,324 @@ def update_page(current_user, page_id):
             page.published_at = datetime.now(timezone.utc)
         page.is_published = data['is_published']
 
-    # Update tags if provided
+    # Replace tags if provided
     if 'tags' in data and isinstance(data['tags'], list):
-        # Clear existing tags
-        page.tags = []
-
-        # Add new tags
-        for tag_name in data['tags']:
-            tag = Tag.query.filter_by(name=tag_name).first()
-            if not tag:
-                tag = Tag(name=tag_name)
-                db.session.add(tag)
-            page.tags.append(tag)
+        tags = resolve_tags(data['tags'])
+        page.tags = list(tags.values())
 
     page.updated_at = datetime.now(timezone.utc)
     db.session.commit()
 
     return jsonify({'message': 'Page updated successfully!', 'page': page.to_dict()})
 
+def find_tags(names):
+    """Get the existing tags with the given names, with one IN query per chunk"""
+    chunk_size = current_app.config.get('BULK_BATCH_SIZE', 500)
+    found = {}
+    for start in range(0, len(names), chunk_size):
+        chunk = names[start:start + chunk_size]
+        found.update((tag.name, tag) for tag in Tag.query.filter(Tag.name.in_(chunk)))
+    return found
+
+def resolve_tags(names):
+    """
+    Get the tags with the given names, creating the missing ones.
+
+    Existing tags are looked up with one IN query per chunk and missing tags
+    are created with a single batched insert. If a concurrent request
+    creates some of them first, the tags are looked up again.
+
+    Returns:
+        A dict mapping tag names to Tag objects, in the order given
+    """
+    names = list(dict.fromkeys(names))
+    found = find_tags(names)
+
+    missing = [Tag(name=name) for name in names if name not in found]
+    if missing:
+        try:
+            with db.session.begin_nested():
+                db.session.add_all(missing)
+        except IntegrityError:
+            found = find_tags(names)
+            missing = [Tag(name=name) for name in names if name not in found]
+            db.session.add_all(missing)
+            db.session.flush()
+        found.update((tag.name, tag) for tag in missing)
+
+    return {name: found[name] for name in names}
+
+def existing_slugs(slugs):
+    """Get the subset of the given slugs that are already used by pages"""
+    slugs = list(slugs)
+    chunk_size = current_app.config.get('BULK_BATCH_SIZE', 500)
+
+    existing = set()
+    for start in range(0, len(slugs), chunk_size):
+        chunk = slugs[start:start + chunk_size]
+        rows = db.session.query(Page.slug).filter(Page.slug.in_(chunk))
+        existing.update(slug for (slug,) in rows)
+    return existing
+
+def bulk_item_error(item, required=()):
+    """
+    Check the types of the fields of a bulk item.
+
+    Returns:
+        The error message for the item, or None if it is valid
+    """
+    for field in required:
+        if not item.get(field):
+            return 'Missing required fields!'
+    for field in ('title', 'content', 'slug', 'summary'):
+        if field in item and not isinstance(item[field], str):
+            return f'Invalid {field}, expected a string!'
+    if 'slug' in item and not item['slug']:
+        return 'Invalid slug, expected a string!'
+    if 'tags' in item and not (isinstance(item['tags'], list)
+                               and all(isinstance(name, str) and name for name in item['tags'])):
+        return 'Invalid tags, expected a list of names!'
+    if 'is_published' in item and not isinstance(item['is_published'], bool):
+        return 'Invalid is_published, expected a boolean!'
+    return None
+
+def bulk_items():
+    """Get the list of items from a bulk request body (a list or {'pages': [...]})"""
+    data = request.get_json(silent=True)
+    items = data.get('pages') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return None
+    return items
+
+def write_in_batches(entries, write):
+    """
+    Write (index, item) entries in batched commits.
+
+    write(batch) adds the batch to the session and returns a list of
+    (index, page_id) for each written item. If a batch fails to commit it is
+    rolled back and retried item by item, so errors are reported per item
+    and the batches committed before are still reported.
+
+    Returns:
+        A list of (index, page_id or None, error or None)
+    """
+    batch_size = current_app.config.get('BULK_BATCH_SIZE', 500)
+    results = []
+
+    for start in range(0, len(entries), batch_size):
+        batch = entries[start:start + batch_size]
+        try:
+            written = write(batch)
+            db.session.commit()
+            results.extend((index, page_id, None) for index, page_id in written)
+        except SQLAlchemyError:
+            db.session.rollback()
+            for entry in batch:
+                try:
+                    written = write([entry])
+                    db.session.commit()
+                    results.extend((index, page_id, None) for index, page_id in written)
+                except SQLAlchemyError as e:
+                    db.session.rollback()
+                    # Statement errors (e.g. unconvertible values) have no driver error
+                    error = getattr(e, 'orig', None) or e
+                    results.append((entry[0], None, f'Database error: {error}'))
+
+    return results
+
+def bulk_response(results, count, success_status, success_label):
+    """Build the per-item report returned by the bulk endpoints"""
+    items = []
+    for index, page_id, error in sorted(results, key=lambda result: result[0]):
+        if error:
+            items.append({'index': index, 'status': 'error', 'message': error})
+        else:
+            items.append({'index': index, 'status': success_label, 'id': page_id})
+
+    failed = sum(1 for item in items if item['status'] == 'error')
+    status = success_status if not failed else 207
+    return jsonify({
+        'message': f'{count - failed} of {count} pages {success_label}.',
+        'results': items
+    }), status
+
+@api.route('/pages/bulk', methods=['POST'])
+@token_required
+def bulk_create_pages(current_user):
+    """Create many pages in batched commits"""
+    items = bulk_items()
+    if items is None:
+        return jsonify({'message': 'Expected a non-empty list of pages!'}), 400
+    if len(items) > current_app.config.get('BULK_MAX_ITEMS', 10000):
+        return jsonify({'message': 'Too many pages in one request!'}), 400
+
+    results = []
+    entries = []
+    seen_slugs = set()
+    for index, item in enumerate(items):
+        error = bulk_item_error(item, ('title', 'content')) if isinstance(item, dict) \
+            else 'Missing required fields!'
+        if error:
+            results.append((index, None, error))
+            continue
+
+        slug = item.get('slug', item['title'].lower().replace(' ', '-'))
+        if slug in seen_slugs:
+            results.append((index, None, 'Duplicate slug in request!'))
+            continue
+        seen_slugs.add(slug)
+        entries.append((index, dict(item, slug=slug)))
+
+    # Reject slugs that already exist with one query instead of failing at commit
+    taken = existing_slugs(item['slug'] for _, item in entries)
+    results.extend((index, None, 'Slug already exists!')
+                   for index, item in entries if item['slug'] in taken)
+    entries = [(index, item) for index, item in entries if item['slug'] not in taken]
+
+    # Resolve every tag name of the request up front and commit new tags once
+    tag_ids = {}
+    tag_names = [name for _, item in entries if isinstance(item.get('tags'), list)
+                 for name in item['tags']]
+    if tag_names:
+        tag_ids = {name: tag.id for name, tag in resolve_tags(tag_names).items()}
+        db.session.commit()
+
+    def write(batch):
+        now = datetime.now(timezone.utc)
+        pages = []
+        for _, item in batch:
+            page = Page(
+                title=item['title'],
+                slug=item['slug'],
+                content=item['content'],
+                summary=item.get('summary', ''),
+                is_published=item.get('is_published', False),
+                user_id=current_user.id,
+                created_at=now
+            )
+            if page.is_published:
+                page.published_at = now
+            pages.append(page)
+
+        db.session.add_all(pages)
+        db.session.flush()
+
+        links = [{'page_id': page.id, 'tag_id': tag_ids[name]}
+                 for page, (_, item) in zip(pages, batch)
+                 if isinstance(item.get('tags'), list)
+                 for name in dict.fromkeys(item['tags'])]
+        if links:
+            db.session.execute(page_tags.insert(), links)
+            # Links written without the ORM are not seen by the cache invalidation hooks
+            mark_stale(db.session, 'pages', *(f'tag:{name}' for _, item in batch
+                                              if isinstance(item.get('tags'), list)
+                                              for name in item['tags']))
+
+        return [(index, page.id) for page, (index, _) in zip(pages, batch)]
+
+    results.extend(write_in_batches(entries, write))
+    return bulk_response(results, len(items), 201, 'created')
+
+@api.route('/pages/bulk', methods=['PATCH'])
+@token_required
+def bulk_update_pages(current_user):
+    """Update many pages in batched commits"""
+    items = bulk_items()
+    if items is None:
+        return jsonify({'message': 'Expected a non-empty list of pages!'}), 400
+    if len(items) > current_app.config.get('BULK_MAX_ITEMS', 10000):
+        return jsonify({'message': 'Too many pages in one request!'}), 400
+
+    results = []
+    candidates = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('id'), int):
+            results.append((index, None, 'Missing page id!'))
+        else:
+            candidates.append((index, item))
+
+    # Look up owners and slugs of every targeted page with one IN query per chunk
+    chunk_size = current_app.config.get('BULK_BATCH_SIZE', 500)
+    ids = list(dict.fromkeys(item['id'] for _, item in candidates))
+    owners = {}
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        owners.update((page_id, (user_id, slug)) for page_id, user_id, slug in
+                      db.session.query(Page.id, Page.user_id, Page.slug).filter(Page.id.in_(chunk)))
+
+    entries = []
+    seen_ids = set()
+    seen_slugs = set()
+    for index, item in candidates:
+        error = bulk_item_error(item)
+        if error:
+            results.append((index, None, error))
+        elif item['id'] not in owners:
+            results.append((index, None, 'Page not found!'))
+        elif owners[item['id']][0] != current_user.id and not current_user.is_admin():
+            results.append((index, None, 'Permission denied!'))
+        elif item['id'] in seen_ids:
+            results.append((index, None, 'Duplicate page id in request!'))
+        elif 'slug' in item and item['slug'] in seen_slugs:
+            results.append((index, None, 'Duplicate slug in request!'))
+        else:
+            seen_ids.add(item['id'])
+            if 'slug' in item:
+                seen_slugs.add(item['slug'])
+            entries.append((index, item))
+
+    # Slugs being changed must not collide with other existing pages
+    changed = {item['slug'] for _, item in entries
+               if 'slug' in item and item['slug'] != owners[item['id']][1]}
+    taken = existing_slugs(changed)
+    results.extend((index, None, 'Slug already exists!') for index, item in entries
+                   if item.get('slug') in changed and item['slug'] in taken)
+    entries = [(index, item) for index, item in entries
+               if not (item.get('slug') in changed and item['slug'] in taken)]
+
+    tag_ids = {}
+    tag_names = [name for _, item in entries if isinstance(item.get('tags'), list)
+                 for name in item['tags']]
+    if tag_names:
+        tag_ids = {name: tag.id for name, tag in resolve_tags(tag_names).items()}
+        db.session.commit()
+
+    def write(batch):
+        now = datetime.now(timezone.utc)
+        pages = {page.id: page for page in
+                 Page.query.filter(Page.id.in_([item['id'] for _, item in batch]))}
+        retagged = []
+        for _, item in batch:
+            page = pages[item['id']]
+            for field in ('title', 'slug', 'content', 'summary'):
+                if field in item:
+                    setattr(page, field, item[field])
+            if 'is_published' in item:
+                if not page.is_published and item['is_published']:
+                    page.published_at = now
+                page.is_published = item['is_published']
+            if isinstance(item.get('tags'), list):
+                retagged.append((page.id, item['tags']))
+            page.updated_at = now
+        db.session.flush()
+
+        # Replace the tags of the retagged pages with one delete and one batched insert
+        if retagged:
+            db.session.execute(page_tags.delete().where(
+                page_tags.c.page_id.in_([page_id for page_id, _ in retagged])))
+            links = [{'page_id': page_id, 'tag_id': tag_ids[name]}
+                     for page_id, names in retagged for name in dict.fromkeys(names)]
+            if links:
+                db.session.execute(page_tags.insert(), links)
+                # Links written without the ORM are not seen by the cache invalidation hooks
+                mark_stale(db.session, 'pages',
+                           *(f'tag:{name}' for _, names in retagged for name in names))
+
+        return [(index, item['id']) for index, item in batch]
+
+    results.extend(write_in_batches(entries, write))
+    return bulk_response(results, len(items), 200, 'updated')
+
 @api.route('/pages/<int:page_id>', methods=['DELETE'])
 @token_required
 def delete_page(current_user, page_id):
@@ -293,24 +745,49 @@ def delete_page(current_user, page_id):
     return jsonify({'message': 'Page deleted successfully!'})
 
 # Tag endpoints
+def tags_version():
+    """Get the ETag of the tags collection from its version token"""
+    return make_etag(namespace_versions(['tags'])[0]), None
+
 @api.route('/tags', methods=['GET'])
-@cache.cached(timeout=300)  # Cache for 5 minutes
+@conditional(tags_version)
+@cached_view(86400, 'tags')  # Cache for 1 day, invalidated on changes
 def get_tags():
     """Get all tags"""
     tags = Tag.query.all()
     return jsonify({'tags': [{'id': tag.id, 'name': tag.name} for tag in tags]})
 
+def tag_catalog_version():
+    """Get the ETag of the tag catalog from its version token"""
+    return make_etag(tag_catalog()[0]), None
+
+@api.route('/tags/catalog', methods=['GET'])
+@conditional(tag_catalog_version)
+def get_tag_catalog():
+    """Get the [id, name] pairs of all tags for tag pickers, optionally filtered by name with q"""
+    version, catalog = tag_catalog()
+    query = request.args.get('q', '').strip().lower()
+    if query:
+        catalog = [entry for entry in catalog if query in entry[1].lower()]
+    return jsonify({'version': version, 'tags': catalog})
+
 @api.route('/tags/<int:tag_id>', methods=['GET'])
 def get_tag(tag_id):
     """Get a specific tag and its pages"""
+    try:
+        fields = requested_fields(Page)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
     tag = Tag.query.get_or_404(tag_id)
 
     # Get published pages with this tag
-    pages = [page.to_dict() for page in tag.pages if page.is_published]
+    pages = Page.query_for_listing(fields).filter(
+        Page.tags.contains(tag), Page.is_published == True).all()
 
     return jsonify({
         'tag': {'id': tag.id, 'name': tag.name},
-        'pages': pages
+        'pages': [page.to_dict(fields) for page in pages]
     })
 
 @api.route('/tags', methods=['POST'])
@@ -368,3 +845,82 @@ def delete_tag(current_user, tag_id):
     db.session.commit()
 
     return jsonify({'message': 'Tag deleted successfully!'})
+
+# Export endpoints
+EXPORT_MODELS = {
+    'pages': (Page, lambda: [selectinload(Page.author).lazyload(User.roles),
+                             selectinload(Page.tags)]),
+    'users': (User, lambda: [selectinload(User.roles)]),
+    'media': (Media, lambda: [selectinload(Media.owner).lazyload(User.roles)])
+}
+
+@api.route('/export/<kind>', methods=['GET'])
+@token_required
+def export(current_user, kind):
+    """Stream every row of a table as NDJSON or CSV (admin only)"""
+    if not current_user.is_admin():
+        return jsonify({'message': 'Permission denied!'}), 403
+
+    if kind not in EXPORT_MODELS:
+        return jsonify({'message': 'Unknown export type!'}), 404
+    model, relation_loaders = EXPORT_MODELS[kind]
+
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'message': 'Unsupported export format!'}), 400
+
+    try:
+        fields = requested_fields(model)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    # Fetch rows in batches from a server-side cursor; relations are loaded per batch
+    query = model.query.options(model.load_fields(fields), *relation_loaders()) \
+        .order_by(model.id).yield_per(current_app.config.get('EXPORT_BATCH_SIZE', 500))
+    rows = (obj.to_dict(fields) for obj in query)
+
+    if export_format == 'csv':
+        body, mimetype = _csv_lines(rows, fields), 'text/csv'
+    else:
+        body = (current_app.json.dumps(row) + '\n' for row in rows)
+        mimetype = 'application/x-ndjson'
+
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={kind}.{export_format}'
+    return response
+
+@api.route('/stats/cache', methods=['GET'])
+@token_required
+def get_cache_stats(current_user):
+    """Get the hit, miss and rebuild stats of the cached views across workers (admin only)"""
+    if not current_user.is_admin():
+        return jsonify({'message': 'Permission denied!'}), 403
+
+    return jsonify(cache_stats())
+
+@api.route('/stats/db-pool', methods=['GET'])
+@token_required
+def get_db_pool_stats(current_user):
+    """Get the connection pool state and checkouts of the worker serving the request (admin only)"""
+    if not current_user.is_admin():
+        return jsonify({'message': 'Permission denied!'}), 403
+
+    return jsonify(pool_stats())
+
+def _csv_lines(rows, fields):
+    """Generate CSV text for the given rows, one line at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    yield line(fields)
+    for row in rows:
+        # List values such as tags and roles are joined into a single cell
+        yield line([';'.join(value) if isinstance(value, list) else value
+                    for value in (row[field] for field in fields)])
@@ -6,11 +6,13 @@ from app import db
 from app.models import User
 from app.forms import LoginForm, RegistrationForm, ResetPasswordRequestForm, ResetPasswordForm
 from app.email import send_password_reset_email, send_verification_email
+from app.ratelimit import rate_limit
 
 # Create blueprint
 auth = Blueprint('auth', __name__)
 
 @auth.route('/login', methods=['GET', 'POST'])
+@rate_limit('10/minute', methods=['POST'])  # Slow down password guessing
 def login():
     """Handle user login"""
     if current_user.is_authenticated:
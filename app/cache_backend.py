@@ -0,0 +1,292 @@
+"""
+Two-tier cache backend: a per-process LRU in front of Redis.
+
+Select it with CACHE_TYPE = 'app.cache_backend.TwoTierRedisCache'. Hits on
+hot keys are served from process memory without a network round trip or
+unpickling. Every write through the cache publishes the changed keys on a
+Redis channel, and each process drops them from its local tier when it
+receives the message. Local entries also expire after CACHE_LOCAL_TTL
+seconds, which bounds staleness if a message is missed (e.g. while the
+subscription reconnects).
+
+Operations that must see the shared state (add, has, inc and dec) always
+go to Redis, so locks and counters keep their semantics. Changes are
+published after they are written, so a peer refetching a key after the
+message always gets the new value.
+
+Keys starting with one of CACHE_LOCAL_EXCLUDE (the rate limit and stats
+counters and the rebuild locks) are never kept in the local tier, so their
+writes publish nothing. Otherwise every counted request would send a
+message to every process.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from flask_caching.backends.rediscache import RedisCache
+
+logger = logging.getLogger(__name__)
+
+class LocalCache:
+    """
+    Thread-safe LRU bounded by the number of entries and their total size.
+
+    Sizes are the lengths of the serialized values as stored in Redis.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024, ttl=5):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get a value.
+
+        Returns:
+            A tuple of (found, value)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+
+            value, _, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return False, None
+
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, size, timeout=None):
+        """Store a value for at most the local TTL (or the shorter cache timeout)"""
+        ttl = min(self.ttl, timeout) if timeout and timeout > 0 else self.ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, size, time.monotonic() + ttl)
+            self.size += size
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, *keys):
+        """Drop keys"""
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+
+    def clear(self):
+        """Drop every key"""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+class TwoTierRedisCache(RedisCache):
+    """RedisCache with a per-process LRU kept consistent through Redis pub/sub"""
+
+    def __init__(self, host='localhost', local_max_entries=1024, local_max_bytes=16 * 1024 * 1024,
+                 local_ttl=5, local_exclude=(), **kwargs):
+        super().__init__(host=host, **kwargs)
+        self.local = LocalCache(local_max_entries, local_max_bytes, local_ttl)
+        self.local_exclude = tuple(local_exclude)
+        self.channel = f'{self.key_prefix}cache-invalidate'
+        self._id = uuid.uuid4().hex
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        """Create the cache from the Flask-Caching configuration"""
+        kwargs.update(
+            local_max_entries=config.get('CACHE_LOCAL_MAX_ENTRIES', 1024),
+            local_max_bytes=config.get('CACHE_LOCAL_MAX_BYTES', 16 * 1024 * 1024),
+            local_ttl=config.get('CACHE_LOCAL_TTL', 5),
+            local_exclude=config.get('CACHE_LOCAL_EXCLUDE', ())
+        )
+        if config.get('CACHE_REDIS_URL'):
+            return super().factory(app, config, args, kwargs)
+
+        # CACHE_REDIS_HOST may also be a client object compatible with redis-py
+        kwargs.update(
+            host=config.get('CACHE_REDIS_HOST', 'localhost'),
+            port=config.get('CACHE_REDIS_PORT', 6379),
+            db=config.get('CACHE_REDIS_DB', 0)
+        )
+        if config.get('CACHE_REDIS_PASSWORD'):
+            kwargs['password'] = config['CACHE_REDIS_PASSWORD']
+        if config.get('CACHE_KEY_PREFIX'):
+            kwargs['key_prefix'] = config['CACHE_KEY_PREFIX']
+        return cls(*args, **kwargs)
+
+    def is_local(self, key):
+        """Check if a key may be kept in the local tier"""
+        return not key.startswith(self.local_exclude)
+
+    def get(self, key):
+        self._ensure_listener()
+        found, value = self.local.get(key)
+        if found:
+            return value
+
+        raw = self._read_client.get(self.key_prefix + key)
+        value = self.serializer.loads(raw)
+        if raw is not None and self.is_local(key):
+            self.local.set(key, value, len(raw))
+        return value
+
+    def get_many(self, *keys):
+        self._ensure_listener()
+        values = {}
+        missing = []
+        for key in keys:
+            found, value = self.local.get(key)
+            if found:
+                values[key] = value
+            else:
+                missing.append(key)
+
+        if missing:
+            raws = self._read_client.mget([self.key_prefix + key for key in missing])
+            for key, raw in zip(missing, raws):
+                values[key] = self.serializer.loads(raw)
+                if raw is not None and self.is_local(key):
+                    self.local.set(key, values[key], len(raw))
+        return [values[key] for key in keys]
+
+    def set(self, key, value, timeout=None):
+        self._ensure_listener()
+        timeout = self._normalize_timeout(timeout)
+        dump = self.serializer.dumps(value)
+        if timeout == -1:
+            result = self._write_client.set(name=self.key_prefix + key, value=dump)
+        else:
+            result = self._write_client.setex(name=self.key_prefix + key, value=dump, time=timeout)
+
+        if self.is_local(key):
+            self.local.set(key, value, len(dump), timeout)
+        self._publish(key)
+        return result
+
+    def set_many(self, mapping, timeout=None):
+        self._ensure_listener()
+        timeout = self._normalize_timeout(timeout)
+        pipe = self._write_client.pipeline(transaction=False)
+        for key, value in mapping.items():
+            dump = self.serializer.dumps(value)
+            if timeout == -1:
+                pipe.set(name=self.key_prefix + key, value=dump)
+            else:
+                pipe.setex(name=self.key_prefix + key, value=dump, time=timeout)
+            if self.is_local(key):
+                self.local.set(key, value, len(dump), timeout)
+        results = pipe.execute()
+
+        self._publish(*mapping)
+        return [key for key, was_set in zip(mapping, results) if was_set]
+
+    def add(self, key, value, timeout=None):
+        created = super().add(key, value, timeout)
+        if created:
+            self.local.delete(key)
+            self._publish(key)
+        return created
+
+    def delete(self, key):
+        result = super().delete(key)
+        self.local.delete(key)
+        self._publish(key)
+        return result
+
+    def delete_many(self, *keys):
+        result = super().delete_many(*keys)
+        self.local.delete(*keys)
+        self._publish(*keys)
+        return result
+
+    def unlink(self, *keys):
+        result = super().unlink(*keys)
+        self.local.delete(*keys)
+        self._publish(*keys)
+        return result
+
+    def clear(self):
+        result = super().clear()
+        self.local.clear()
+        self._publish('*')
+        return result
+
+    def inc(self, key, delta=1):
+        result = super().inc(key, delta)
+        self.local.delete(key)
+        self._publish(key)
+        return result
+
+    def dec(self, key, delta=1):
+        result = super().dec(key, delta)
+        self.local.delete(key)
+        self._publish(key)
+        return result
+
+    def _publish(self, *keys):
+        """Tell the other processes to drop keys from their local tier"""
+        # No process holds the excluded keys locally
+        keys = [key for key in keys if key == '*' or self.is_local(key)]
+        if keys:
+            self._write_client.publish(self.channel, json.dumps({'sender': self._id, 'keys': keys}))
+
+    def handle_message(self, data):
+        """Apply an invalidation message published by another process"""
+        message = json.loads(data)
+        if message['sender'] == self._id:
+            return
+        if '*' in message['keys']:
+            self.local.clear()
+        else:
+            self.local.delete(*message['keys'])
+
+    def _ensure_listener(self):
+        """Start the subscriber thread in this process (again after a fork)"""
+        if self._listener_pid == os.getpid():
+            return
+        with self._listener_lock:
+            if self._listener_pid == os.getpid():
+                return
+            # A forked worker inherits entries it can no longer get invalidations for
+            self.local.clear()
+            self._id = uuid.uuid4().hex
+            self._listener_pid = os.getpid()
+            threading.Thread(target=self._listen, name='cache-invalidate', daemon=True).start()
+
+    def _listen(self):
+        """Receive invalidation messages, resubscribing after connection errors"""
+        while True:
+            try:
+                pubsub = self._read_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    if message and message.get('type') == 'message':
+                        self.handle_message(message['data'])
+            except Exception:
+                logger.warning('Cache invalidation subscription lost, resubscribing', exc_info=True)
+
+            # Messages may have been missed while disconnected
+            self.local.clear()
+            time.sleep(1)
@@ -0,0 +1,120 @@
+"""
+Statistics of cached views.
+
+cached_view records per endpoint (the prefix of its cache keys) how its
+requests were answered:
+
+- hits: fresh entries
+- stale: outdated entries served while another request rebuilds them
+- waits: entries rebuilt by another worker while the request waited
+- misses: requests that rendered the view themselves
+- bypasses: requests not cached (see the audience and unless arguments)
+- rebuilds and rebuild_ms: renders for the cache, including background
+  refreshes, and the time they took
+- stores and bytes: entries written to the cache and their body size
+
+Each worker counts in memory and adds its counts to counters in the
+shared cache at most every CACHE_STATS_FLUSH_INTERVAL seconds, so the
+stats of all workers are aggregated without a cache round trip per
+request. Reading the stats therefore lags by up to one interval.
+"""
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from flask import current_app
+from app import cache
+
+FIELDS = ('hits', 'stale', 'waits', 'misses', 'bypasses', 'rebuilds', 'rebuild_ms', 'stores',
+          'bytes')
+
+# Counts of this process not yet added to the shared counters
+_pending = defaultdict(Counter)
+_pending_pid = None
+_pending_lock = threading.Lock()
+_last_flush = 0.0
+
+def stats_key(endpoint, field):
+    """Get the cache key of a shared counter"""
+    return f'stats/{endpoint}/{field}'
+
+def record_stats(endpoint, **counts):
+    """Count events of a cached endpoint, flushing the counts when they are due"""
+    with _pending_lock:
+        _claim_pending()
+        _pending[endpoint].update(counts)
+    flush_stats()
+
+def _claim_pending():
+    """Drop the counts inherited from a parent process, which flushes them itself"""
+    global _pending_pid
+    if _pending_pid != os.getpid():
+        _pending.clear()
+        _pending_pid = os.getpid()
+
+def flush_stats(force=False):
+    """Add the counts of this process to the shared counters"""
+    global _last_flush
+    interval = current_app.config.get('CACHE_STATS_FLUSH_INTERVAL', 10)
+    with _pending_lock:
+        _claim_pending()
+        now = time.monotonic()
+        if not _pending or (not force and now - _last_flush < interval):
+            return
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = now
+
+    try:
+        for endpoint, counts in pending.items():
+            for field, count in counts.items():
+                if count:
+                    # inc() is atomic on RedisCache; SimpleCache keeps counters for
+                    # CACHE_DEFAULT_TIMEOUT
+                    cache.cache.inc(stats_key(endpoint, field), count)
+    except Exception:
+        current_app.logger.exception('Failed to flush cache stats')
+
+def cached_endpoints():
+    """Get the endpoints decorated with cached_view and their timeouts"""
+    views = sorted(current_app.view_functions.items())
+    return {endpoint: view.cache_timeout for endpoint, view in views
+            if hasattr(view, 'cache_namespaces')}
+
+def cache_stats():
+    """
+    Get the aggregated stats of every cached endpoint.
+
+    Returns:
+        A dict mapping endpoints to their counters, timeout, hit ratio
+        (requests answered from the cache), average rebuild time in ms and
+        average entry size in bytes
+    """
+    flush_stats(force=True)
+    endpoints = cached_endpoints()
+    keys = [stats_key(endpoint, field) for endpoint in endpoints for field in FIELDS]
+    values = iter(cache.get_many(*keys) if keys else [])
+
+    stats = {}
+    for endpoint, timeout in endpoints.items():
+        counts = {field: int(next(values) or 0) for field in FIELDS}
+        cached = counts['hits'] + counts['stale'] + counts['waits']
+        requests = cached + counts['misses']
+        rebuilds, stores = counts['rebuilds'], counts['stores']
+        stats[endpoint] = {
+            **counts,
+            'timeout': timeout,
+            'hit_ratio': round(cached / requests, 4) if requests else None,
+            'avg_rebuild_ms': round(counts['rebuild_ms'] / rebuilds, 1) if rebuilds else None,
+            'avg_entry_bytes': counts['bytes'] // stores if stores else None
+        }
+    return stats
+
+def reset_cache_stats():
+    """Reset the counters of every cached endpoint"""
+    with _pending_lock:
+        _pending.clear()
+    # delete_many() stops at the first missing key unless CACHE_IGNORE_ERRORS is set
+    for endpoint in cached_endpoints():
+        for field in FIELDS:
+            cache.delete(stats_key(endpoint, field))
@@ -0,0 +1,67 @@
+"""
+Warming of cached views.
+
+After a deploy or a flush of the cache every cached view starts cold and
+the first requests all render from the database. warm_cache() requests
+the public views (the index, sitemap and listings, every published page
+and every tag) as an anonymous reader, so their entries are built before
+traffic arrives. Requests run through the application in-process, so they
+take the same path as real ones (audience, namespaces and rebuild locks)
+but are not counted by the rate limits.
+
+Run it with `flask cache-warm`, or set CACHE_WARM_ON_START to run it from
+the gunicorn when_ready hook. Warming only helps when the cache is shared
+with the workers (RedisCache), not with the per-process SimpleCache.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, url_for
+from app.models import Page, Tag
+from app.ratelimit import EXEMPT_ENVIRON_KEY
+
+def warm_urls():
+    """Get the URLs of the public cached views"""
+    slugs = [slug for (slug,) in Page.query.with_entities(Page.slug).filter_by(is_published=True)
+             .order_by(Page.published_at.desc())]
+    tag_names = [name for (name,) in Tag.query.with_entities(Tag.name).order_by(Tag.name)]
+
+    with current_app.test_request_context():
+        # The index is linked as /index but most visitors land on /
+        return [
+            '/',
+            url_for('main.index'),
+            url_for('main.sitemap'),
+            url_for('content.pages'),
+            url_for('api.get_pages'),
+            url_for('api.get_tags'),
+            *(url_for('content.page', slug=slug) for slug in slugs),
+            *(url_for('content.tag_pages', tag_name=name) for name in tag_names)
+        ]
+
+def warm_cache(urls=None, workers=None):
+    """
+    Request views so their cache entries are built.
+
+    Args:
+        urls: URLs to request, by default those of warm_urls()
+        workers: Number of concurrent requests, by default CACHE_WARM_WORKERS
+
+    Returns:
+        A list of (url, status code, milliseconds) tuples in the order of urls
+    """
+    app = current_app._get_current_object()
+    urls = warm_urls() if urls is None else urls
+    workers = workers or app.config.get('CACHE_WARM_WORKERS', 4)
+
+    def fetch(url):
+        started = time.perf_counter()
+        try:
+            status = app.test_client().get(url, environ_base={EXEMPT_ENVIRON_KEY: True}).status_code
+        except Exception:
+            app.logger.exception('Failed to warm %s', url)
+            status = 500
+        return url, status, round((time.perf_counter() - started) * 1000)
+
+    # Each thread handles its requests in its own app context and database session
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cache-warm') as executor:
+        return list(executor.map(fetch, urls))
@@ -0,0 +1,479 @@
+"""
+Caching and invalidation of views.
+
+Cached views declare the namespaces their output depends on, e.g.
+'pages' for listings of published pages or 'tag:{tag_name}' for the pages
+of one tag (placeholders are filled from the view arguments). Each
+namespace has a random version token stored in the cache, and a cached
+entry is only fresh while it was built with the current tokens.
+
+When a session commits changes to pages, tags, page_tags or usernames, the
+namespaces affected by the changes get new tokens, so exactly the views
+depending on them miss and are rebuilt on the next request. This lets
+views use long timeouts without serving stale content. Code writing
+page_tags rows without the ORM must report them with mark_stale().
+
+Namespaces:
+
+- 'pages': listings of published pages (and the tags and authors shown with them)
+- 'page:<slug>' and 'page-id:<id>': a single page
+- 'tags': the list of tags
+- 'tag:<name>': the pages of one tag
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from flask import (copy_current_request_context, current_app, g, has_app_context, make_response,
+                   request, session)
+from flask_login import current_user
+from markupsafe import Markup, escape
+from sqlalchemy import event, inspect, select
+from app import cache, db
+from app.cache_stats import record_stats
+from app.models import Page, Tag, User, page_tags
+
+# Seconds between checks for an entry rebuilt by another worker
+LOCK_POLL_INTERVAL = 0.05
+
+# Values personal to the current user, rendered with personal()
+PERSONAL_VALUES = {
+    'username': lambda: current_user.username
+}
+
+# Background refreshes of stale entries (see cached_view)
+_refresh_executor = None
+_refresh_pid = None
+_refresh_lock = threading.Lock()
+_refresh_futures = set()
+
+# Tag catalog of this process, as (version, catalog) (see tag_catalog)
+_tag_catalog = (None, None)
+
+def namespace_key(namespace):
+    """Get the cache key holding the version token of a namespace"""
+    return f'ns/{namespace}'
+
+def namespace_versions(namespaces):
+    """
+    Get the version tokens of namespaces, creating missing ones.
+
+    A namespace whose token is missing (never set or evicted) gets a new
+    token, which makes every view depending on it miss.
+    """
+    keys = [namespace_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(*keys)
+    for index, (key, version) in enumerate(zip(keys, versions)):
+        if version is None:
+            # add() keeps the token of a concurrent request that got there first
+            cache.add(key, uuid.uuid4().hex, timeout=0)
+            versions[index] = cache.get(key)
+    return versions
+
+def bump_namespaces(namespaces):
+    """Give namespaces new version tokens, invalidating the views depending on them"""
+    if namespaces:
+        tokens = {namespace_key(namespace): uuid.uuid4().hex for namespace in namespaces}
+        cache.set_many(tokens, timeout=0)
+
+def view_cache_key(audience=None):
+    """Get the cache key of the current request's view for an audience"""
+    if audience is None:
+        return f'view/{request.full_path}'
+    return f'view/{audience}{request.full_path}'
+
+def user_audience(owner_id=None):
+    """
+    Get the audience of the current user.
+
+    Responses may only depend on the user through the audience: anonymous,
+    user, author (the owner of the resource) or admin. Values personal to
+    one user are rendered with personal() instead.
+    """
+    if not current_user.is_authenticated:
+        return 'anonymous'
+    if current_user.is_admin():
+        return 'admin'
+    if owner_id is not None and current_user.id == owner_id:
+        return 'author'
+    return 'user'
+
+def request_audience(**view_args):
+    """Audience callable for views that do not depend on the owner of a resource"""
+    return user_audience()
+
+def personal(name):
+    """
+    Render a value personal to the current user (available in templates).
+
+    While a view is rendered for the cache a placeholder is written
+    instead, which is filled in for each user when the response is served.
+    """
+    if g.get('cache_render'):
+        return Markup(f'<!--personal:{name}-->')
+    return PERSONAL_VALUES[name]()
+
+def personalize(response):
+    """Fill in the personal placeholders of a response for the current user"""
+    if response.is_streamed or response.mimetype != 'text/html':
+        return response
+
+    body = response.get_data()
+    if b'<!--personal:' in body:
+        for name, get_value in PERSONAL_VALUES.items():
+            value = str(escape(get_value())).encode()
+            body = body.replace(f'<!--personal:{name}-->'.encode(), value)
+        response.set_data(body)
+        # The body now differs per user, so it must not be cached by its digest
+        response.personalized = True
+    return response
+
+def render_for_cache(f, args, kwargs):
+    """Run a view with personal values left as placeholders"""
+    started = time.perf_counter()
+    g.cache_render = True
+    try:
+        return make_response(f(*args, **kwargs))
+    finally:
+        g.cache_render = False
+        elapsed_ms = round((time.perf_counter() - started) * 1000)
+        record_stats(request.endpoint, rebuilds=1, rebuild_ms=elapsed_ms)
+
+def entry_version(namespaces, view_args):
+    """
+    Get the version a cached view entry must have to be fresh.
+
+    The version contains the ETag set by conditional() (if any) and the
+    version tokens of the view's namespaces, formatted with the view
+    arguments.
+    """
+    names = [namespace.format(**view_args) for namespace in namespaces]
+    return [g.get('etag'), *namespace_versions(names)]
+
+def entry_response(entry):
+    """Rebuild the response stored in a cache entry for the current user"""
+    response = current_app.response_class(entry['body'], status=entry['status'],
+                                          headers=entry['headers'])
+    return personalize(response)
+
+def store_entry(key, version, timeout, response):
+    """Store a response rendered by render_for_cache if it is successful and return it"""
+    if response.status_code != 200 or response.is_streamed:
+        return personalize(response)
+
+    headers = [(name, value) for name, value in response.headers
+               if name not in ('Set-Cookie', 'Content-Length')]
+    grace = current_app.config.get('CACHE_STALE_GRACE', 60)
+    body = response.get_data()
+    cache.set(key, {
+        'version': version,
+        'expires': time.time() + timeout,
+        'status': response.status_code,
+        'headers': headers,
+        'body': body
+    }, timeout=timeout + grace)
+    record_stats(request.endpoint, stores=1, bytes=len(body))
+    return personalize(response)
+
+def is_fresh(entry, version):
+    """Check if a cache entry matches the version and has not expired"""
+    return entry is not None and entry['version'] == version and entry['expires'] > time.time()
+
+def is_servable_stale(entry, version):
+    """Check if an outdated entry may be served while another worker rebuilds it"""
+    # A different ETag means conditional() already announced a newer body
+    return entry is not None and entry['version'][0] == version[0]
+
+def wait_for_entry(key, version):
+    """
+    Wait for another worker to rebuild an entry.
+
+    Returns:
+        The fresh entry, or None if the lock was released or the wait timed
+        out without one
+    """
+    deadline = time.monotonic() + current_app.config.get('CACHE_LOCK_WAIT', 3)
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if is_fresh(entry, version):
+            return entry
+        if not cache.has(f'lock/{key}'):
+            return None
+    return None
+
+def get_refresh_executor():
+    """Get the thread pool refreshing entries in the background, creating it in each process"""
+    global _refresh_executor, _refresh_pid
+    if _refresh_pid != os.getpid():
+        with _refresh_lock:
+            if _refresh_pid != os.getpid():
+                _refresh_executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('CACHE_REFRESH_WORKERS', 2),
+                    thread_name_prefix='cache-refresh')
+                _refresh_futures.clear()
+                _refresh_pid = os.getpid()
+    return _refresh_executor
+
+def schedule_refresh(key, version, timeout, f, args, kwargs):
+    """
+    Rebuild an entry in the background.
+
+    The view runs in a copy of the current request context. The caller
+    must hold the rebuild lock, which is released when the refresh ends.
+    """
+    @copy_current_request_context
+    def refresh():
+        try:
+            store_entry(key, version, timeout, render_for_cache(f, args, kwargs))
+        except Exception:
+            current_app.logger.exception('Background refresh of %s failed', key)
+        finally:
+            cache.delete(f'lock/{key}')
+
+    future = get_refresh_executor().submit(refresh)
+    _refresh_futures.add(future)
+    future.add_done_callback(_refresh_futures.discard)
+    return future
+
+def wait_for_refreshes(timeout=None):
+    """Wait for the pending background refreshes of this process"""
+    futures.wait(list(_refresh_futures), timeout=timeout)
+
+def cached_view(timeout, *namespaces, audience=None, unless=None, stale_while_revalidate=False):
+    """
+    Decorator caching the response of a view.
+
+    Entries are invalidated when their namespaces are bumped (see the
+    module docstring) or after the timeout. On a miss only the worker
+    holding the rebuild lock runs the view; the others serve the outdated
+    entry if there is one, or wait for the rebuilt entry. The lock is a
+    cache.add() key, which is atomic on RedisCache.
+
+    With stale_while_revalidate, the lock holder also serves the outdated
+    entry and rebuilds it in the background, so no request waits for a
+    rebuild while an outdated entry exists. Expired entries are kept for
+    CACHE_STALE_GRACE seconds.
+
+    Views whose response depends on the user pass an audience callable
+    (e.g. request_audience), called with the view arguments. Each audience
+    gets its own entry, shared by all users in it; returning None bypasses
+    the cache. Such views are not cached while flashed messages are
+    pending, as those are rendered into the page.
+
+    How requests were answered is counted per endpoint (see
+    app.cache_stats).
+
+    Args:
+        timeout: Seconds the response is fresh
+        namespaces: Namespace templates, formatted with the view arguments
+        audience: Callable returning the audience of the current user
+        unless: Callable returning True to bypass the cache
+        stale_while_revalidate: Serve outdated entries while refreshing them
+
+    Returns:
+        The decorated view function
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if unless is not None and unless():
+                record_stats(request.endpoint, bypasses=1)
+                return f(*args, **kwargs)
+
+            variant = None
+            if audience is not None:
+                variant = audience(**kwargs)
+                if variant is None or session.get('_flashes'):
+                    record_stats(request.endpoint, bypasses=1)
+                    return f(*args, **kwargs)
+
+            try:
+                key = view_cache_key(variant)
+                version = entry_version(namespaces, kwargs)
+                entry = cache.get(key)
+            except Exception:
+                if current_app.debug:
+                    raise
+                current_app.logger.exception('Exception possibly due to cache backend.')
+                return f(*args, **kwargs)
+
+            if is_fresh(entry, version):
+                record_stats(request.endpoint, hits=1)
+                return entry_response(entry)
+
+            # Only one worker rebuilds a missing or outdated entry
+            lock_key = f'lock/{key}'
+            if cache.add(lock_key, 1, timeout=current_app.config.get('CACHE_LOCK_TIMEOUT', 30)):
+                if stale_while_revalidate and is_servable_stale(entry, version):
+                    record_stats(request.endpoint, stale=1)
+                    schedule_refresh(key, version, timeout, f, args, kwargs)
+                    return entry_response(entry)
+                record_stats(request.endpoint, misses=1)
+                try:
+                    return store_entry(key, version, timeout, render_for_cache(f, args, kwargs))
+                finally:
+                    cache.delete(lock_key)
+
+            if is_servable_stale(entry, version):
+                record_stats(request.endpoint, stale=1)
+                return entry_response(entry)
+
+            entry = wait_for_entry(key, version)
+            if entry is not None:
+                record_stats(request.endpoint, waits=1)
+                return entry_response(entry)
+            record_stats(request.endpoint, misses=1)
+            return store_entry(key, version, timeout, render_for_cache(f, args, kwargs))
+
+        decorated.cache_timeout = timeout
+        decorated.cache_namespaces = namespaces
+        decorated.uncached = f
+        return decorated
+
+    return decorator
+
+def cache_version(namespace):
+    """
+    Get the version token of a namespace (available in templates).
+
+    Used as part of the key of template fragments, e.g.
+    {% cache 86400, 'page-content', page.id|string, cache_version('page-id:' ~ page.id) %}
+    """
+    return namespace_versions([namespace])[0]
+
+def tag_catalog():
+    """
+    Get the (id, name) pairs of all tags, ordered by name.
+
+    The catalog is stored in the cache under the version token of the
+    'tags' namespace, which changes when tags are created, renamed or
+    deleted, and each process keeps the current catalog in memory. Forms
+    listing tags therefore run no query while the tags are unchanged.
+
+    Returns:
+        A tuple of (version, catalog)
+    """
+    global _tag_catalog
+    # Read the version before the tags, so a concurrent change is never stored under the new version
+    version = cache_version('tags')
+    if _tag_catalog[0] == version:
+        return _tag_catalog
+
+    key = f'tag-catalog/{version}'
+    catalog = cache.get(key)
+    if catalog is None:
+        rows = db.session.execute(select(Tag.id, Tag.name).order_by(Tag.name))
+        catalog = [tuple(row) for row in rows]
+        cache.set(key, catalog, timeout=86400)
+
+    _tag_catalog = (version, catalog)
+    return _tag_catalog
+
+def mark_stale(session, *namespaces):
+    """Schedule namespaces to be bumped when the session commits"""
+    session.info.setdefault('stale_namespaces', set()).update(namespaces)
+
+def history_values(history, *current):
+    """Get the old and new values of an attribute from its history"""
+    if history.has_changes():
+        return (*history.unchanged, *history.added, *history.deleted)
+    return current
+
+def page_namespaces(page, state):
+    """Get the namespaces affected by a change to a page, except those of its unloaded tags"""
+    namespaces = {'pages'}
+    if page.id is not None:
+        namespaces.add(f'page-id:{page.id}')
+
+    # Include the old slug and tags of renamed or retagged pages
+    slugs = history_values(state.attrs.slug.history, page.slug)
+    namespaces.update(f'page:{slug}' for slug in slugs if slug)
+    if 'tags' not in state.unloaded:
+        tags = history_values(state.attrs.tags.history, *page.tags)
+        namespaces.update(f'tag:{tag.name}' for tag in tags)
+    return namespaces
+
+def tag_namespaces(tag, state):
+    """Get the namespaces affected by a change to a tag"""
+    name_history = state.attrs.name.history
+    renamed = name_history.has_changes() and state.persistent
+    deleted = tag in state.session.deleted
+    namespaces = {f'tag:{name}' for name in history_values(name_history, tag.name) if name}
+
+    if state.pending or renamed or deleted:
+        namespaces.add('tags')
+
+    # Renamed and deleted tags change every page showing them
+    if renamed or deleted:
+        namespaces.add('pages')
+        for page in tag.pages:
+            namespaces.update((f'page:{page.slug}', f'page-id:{page.id}'))
+    return namespaces
+
+def collect_stale_namespaces(session, flush_context, instances):
+    """Record the namespaces affected by the objects about to be flushed"""
+    if not has_app_context():
+        return
+
+    namespaces = set()
+    untagged_ids = []
+    renamed_user_ids = []
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, (Page, Tag, User)):
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+
+        state = inspect(obj)
+        if isinstance(obj, User):
+            # Listings and pages show the author's username
+            if state.persistent and state.attrs.username.history.has_changes():
+                namespaces.add('pages')
+                renamed_user_ids.append(obj.id)
+        elif isinstance(obj, Page):
+            namespaces.update(page_namespaces(obj, state))
+            if 'tags' in state.unloaded and obj.id is not None:
+                untagged_ids.append(obj.id)
+        else:
+            namespaces.update(tag_namespaces(obj, state))
+
+    # Look up the tags of pages changed without loading them in one query
+    if untagged_ids:
+        rows = session.execute(select(Tag.name).join(page_tags)
+                               .where(page_tags.c.page_id.in_(untagged_ids)).distinct())
+        namespaces.update(f'tag:{name}' for (name,) in rows)
+
+    # Look up the pages of renamed authors in one query
+    if renamed_user_ids:
+        rows = session.execute(select(Page.slug, Page.id).where(Page.user_id.in_(renamed_user_ids)))
+        for slug, page_id in rows:
+            namespaces.update((f'page:{slug}', f'page-id:{page_id}'))
+
+    if namespaces:
+        mark_stale(session, *namespaces)
+
+def bump_stale_namespaces(session):
+    """Bump the namespaces recorded for the committed transaction"""
+    namespaces = session.info.pop('stale_namespaces', None)
+    if namespaces and has_app_context():
+        bump_namespaces(namespaces)
+        current_app.logger.debug('Invalidated cache namespaces: %s', ', '.join(sorted(namespaces)))
+
+def discard_stale_namespaces(session):
+    """Forget the namespaces recorded for a rolled back transaction"""
+    session.info.pop('stale_namespaces', None)
+
+def init_cache_invalidation(app):
+    """Register the cache invalidation session hooks (once per process) and template helpers"""
+    app.add_template_global(cache_version)
+    app.add_template_global(personal)
+
+    for name, listener in (('before_flush', collect_stale_namespaces),
+                           ('after_commit', bump_stale_namespaces),
+                           ('after_rollback', discard_stale_namespaces)):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
@@ -1,9 +1,12 @@
 import click
+import json
 import os
 import shutil
 from flask.cli import with_appcontext
 from datetime import datetime, timezone
 from app import db
+from app.cache_stats import cache_stats, reset_cache_stats
+from app.cache_warm import warm_cache
 from app.models import User, Role, Tag
 
 # Try to import ChromaDB utilities
@@ -154,6 +157,46 @@ def restore_db_command(backup_path):
 
     click.echo('Restore completed successfully')
 
+@click.command('cache-stats')
+@click.option('--json', 'as_json', is_flag=True, help='Print the stats as JSON.')
+@click.option('--reset', is_flag=True, help='Reset the counters after printing them.')
+@with_appcontext
+def cache_stats_command(as_json, reset):
+    """Show hit, miss and rebuild stats of the cached views."""
+    stats = cache_stats()
+
+    if as_json:
+        click.echo(json.dumps(stats, indent=2))
+    else:
+        click.echo(f"{'endpoint':<24} {'timeout':>8} {'hits':>8} {'stale':>8} {'waits':>8} "
+                   f"{'misses':>8} {'bypass':>8} {'ratio':>7} {'rebuild':>10} {'avg size':>10}")
+        for endpoint, row in stats.items():
+            ratio = f"{row['hit_ratio']:.1%}" if row['hit_ratio'] is not None else '-'
+            rebuild = f"{row['avg_rebuild_ms']}ms" if row['avg_rebuild_ms'] is not None else '-'
+            size = f"{row['avg_entry_bytes']}B" if row['avg_entry_bytes'] is not None else '-'
+            click.echo(f"{endpoint:<24} {row['timeout']:>8} {row['hits']:>8} {row['stale']:>8} "
+                       f"{row['waits']:>8} {row['misses']:>8} {row['bypasses']:>8} {ratio:>7} "
+                       f"{rebuild:>10} {size:>10}")
+
+    if reset:
+        reset_cache_stats()
+        click.echo('Cache stats reset.')
+
+@click.command('cache-warm')
+@click.option('--workers', type=int, default=None,
+              help='Concurrent requests (default: CACHE_WARM_WORKERS).')
+@with_appcontext
+def cache_warm_command(workers):
+    """Build the cache entries of the public views."""
+    results = warm_cache(workers=workers)
+    failed = [(url, status) for url, status, _ in results if status != 200]
+    for url, status in failed:
+        click.echo(f'{url}: {status}')
+
+    total_ms = sum(ms for _, _, ms in results)
+    warmed = len(results) - len(failed)
+    click.echo(f'Warmed {warmed} of {len(results)} views ({total_ms}ms rendering).')
+
 def register_commands(app):
     """Register CLI commands with the Flask application."""
     app.cli.add_command(init_db_command)
@@ -161,3 +204,5 @@ def register_commands(app):
     app.cli.add_command(init_chroma_command)
     app.cli.add_command(backup_db_command)
     app.cli.add_command(restore_db_command)
+    app.cli.add_command(cache_stats_command)
+    app.cli.add_command(cache_warm_command)
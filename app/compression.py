@@ -0,0 +1,90 @@
+"""
+Response compression for text responses.
+
+Responses are compressed with brotli (when installed) or gzip, negotiated
+with the Accept-Encoding header. Compressed bodies of cached views
+(cache.cached or cached_view) are stored in the cache under a digest of
+the uncompressed body, so a cached page is only compressed once per
+timeout. Bodies filled with personal values are compressed on each
+request, as they differ for every user.
+"""
+import gzip
+import hashlib
+from flask import current_app, request
+from app import cache
+
+# Try to import brotli, but don't fail if it's not installed
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+def init_compression(app):
+    """Register the after_request hook compressing responses"""
+    if app.config.get('COMPRESS_ENABLED', True):
+        app.after_request(compress_response)
+
+def supported_encodings():
+    """Get the supported content codings in order of preference"""
+    return ['br', 'gzip'] if BROTLI_AVAILABLE else ['gzip']
+
+def compress(data, encoding):
+    """Compress data with the given content coding"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=current_app.config.get('COMPRESS_BR_LEVEL', 4))
+    # A fixed mtime keeps the output stable for identical bodies
+    return gzip.compress(data, compresslevel=current_app.config.get('COMPRESS_LEVEL', 6), mtime=0)
+
+def is_compressible(response):
+    """Check if a response is a complete text body worth compressing"""
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    return response.mimetype in current_app.config.get('COMPRESS_MIMETYPES', ())
+
+def compress_response(response):
+    """Compress the response body if the client accepts a supported coding"""
+    if not is_compressible(response):
+        return response
+
+    # Caches must keep compressed and uncompressed variants apart
+    response.vary.add('Accept-Encoding')
+
+    if response.content_length is not None and \
+            response.content_length < current_app.config.get('COMPRESS_MIN_SIZE', 500):
+        return response
+
+    encoding = request.accept_encodings.best_match(supported_encodings())
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < current_app.config.get('COMPRESS_MIN_SIZE', 500):
+        return response
+
+    # Reuse the compressed body of cached views instead of compressing every hit,
+    # except for personalized bodies which would add an entry per user
+    view = current_app.view_functions.get(request.endpoint)
+    cache_timeout = getattr(view, 'cache_timeout', None)
+    if cache_timeout is not None and not getattr(response, 'personalized', False):
+        key = f'compressed/{encoding}/{hashlib.sha1(body).hexdigest()}'
+        compressed = cache.get(key)
+        if compressed is None:
+            compressed = compress(body, encoding)
+            cache.set(key, compressed, timeout=cache_timeout)
+    else:
+        compressed = compress(body, encoding)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+
+    # A strong ETag identifies one representation, so tag the compressed variant
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+
+    return response
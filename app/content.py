@@ -4,22 +4,33 @@ from werkzeug.utils import secure_filename
 from datetime import datetime, timezone
 import os
 import uuid
-from app import db, cache
+from app import db
 from app.models import Page, Tag, Media, PageVersion
 from app.forms import PageForm, MediaUploadForm, TagForm
+from app.caching import cached_view, request_audience, tag_catalog, user_audience
+from app.view_counts import count_views
 
 # Create blueprint
 content = Blueprint('content', __name__)
 
 @content.route('/pages')
-@cache.cached(timeout=60)  # Cache for 1 minute
+# Cache for 1 day per audience, refreshed in the background on changes
+@cached_view(86400, 'pages', audience=request_audience, stale_while_revalidate=True)
 def pages():
     """Display list of published pages"""
-    pages = Page.query.filter_by(is_published=True).order_by(Page.created_at.desc()).all()
+    pages = Page.query_for_listing().filter_by(is_published=True) \
+        .order_by(Page.created_at.desc()).all()
     return render_template('content/pages.html', title='Pages', pages=pages)
 
+def page_audience(slug):
+    """Get the audience of the current user for a page, where the author sees edit controls"""
+    owner_id = db.session.query(Page.user_id).filter_by(slug=slug).scalar()
+    return user_audience(owner_id)
+
 @content.route('/page/<slug>')
-@cache.cached(timeout=60, unless=lambda: current_user.is_authenticated)  # Cache for 1 minute, unless user is logged in
+@count_views
+# Cache for 1 day per audience, invalidated on changes
+@cached_view(86400, 'page:{slug}', audience=page_audience)
 def page(slug):
     """Display a single page by slug"""
     page = Page.query.filter_by(slug=slug).first_or_404()
@@ -38,7 +49,7 @@ def create_page():
     form = PageForm()
 
     # Get all available tags for the form
-    form.tags.choices = [(tag.id, tag.name) for tag in Tag.query.order_by(Tag.name).all()]
+    form.tags.choices = tag_catalog()[1]
 
     if form.validate_on_submit():
         page = Page(
@@ -92,7 +103,7 @@ def edit_page(slug):
         abort(403)
 
     form = PageForm()
-    form.tags.choices = [(tag.id, tag.name) for tag in Tag.query.order_by(Tag.name).all()]
+    form.tags.choices = tag_catalog()[1]
 
     if form.validate_on_submit():
         # Create a page version before updating
@@ -258,18 +269,20 @@ def upload_media():
 
 @content.route('/tags')
 @login_required
-@cache.cached(timeout=300)  # Cache for 5 minutes
+# Cache for 1 day per audience, invalidated on changes
+@cached_view(86400, 'tags', audience=request_audience)
 def tags():
     """Display list of tags"""
     tags = Tag.query.order_by(Tag.name).all()
     return render_template('content/tags.html', title='Tags', tags=tags)
 
 @content.route('/tag/<tag_name>')
-@cache.cached(timeout=60)  # Cache for 1 minute
+# Cache for 1 day per audience, invalidated on changes
+@cached_view(86400, 'tag:{tag_name}', audience=request_audience)
 def tag_pages(tag_name):
     """Display pages with a specific tag"""
     tag = Tag.query.filter_by(name=tag_name).first_or_404()
-    pages = Page.query.filter(Page.tags.contains(tag), Page.is_published==True).all()
+    pages = Page.query_for_listing().filter(Page.tags.contains(tag), Page.is_published==True).all()
 
     return render_template('content/tag_pages.html', title=f'Tag: {tag.name}',
                           tag=tag, pages=pages)
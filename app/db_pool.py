@@ -0,0 +1,129 @@
+"""
+Database connection pools of the worker processes.
+
+Every gunicorn worker has its own pool, so the connections a server
+database must accept are the sum over all workers. configure_pool()
+divides DB_MAX_CONNECTIONS (minus DB_RESERVED_CONNECTIONS for CLI
+commands, migrations and maintenance) by the number of workers from
+WEB_CONCURRENCY, and sizes each worker's pool to fit: DB_POOL_SIZE
+persistent connections at most, with the rest of the worker's share as
+overflow. Connections are checked with a ping before use and recycled
+after DB_POOL_RECYCLE seconds, so connections dropped by the server or a
+proxy are replaced transparently. SQLite engines are left to
+Flask-SQLAlchemy's defaults.
+
+Pools must not be shared across a fork: when the app is preloaded in the
+gunicorn master, each worker calls dispose_engines() in post_fork so it
+opens its own connections.
+
+Pool events are counted per process and reported with the current state
+of the pools by pool_stats().
+"""
+import os
+import threading
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from app import db
+
+# Event counts of this process per engine (see pool_stats)
+_counters = {}
+_counters_lock = threading.Lock()
+
+def pool_options(config):
+    """
+    Get the engine options sizing the pool of one worker.
+
+    Returns:
+        A dict of engine options, empty for SQLite
+    """
+    uri = config.get('SQLALCHEMY_DATABASE_URI')
+    if not uri or make_url(uri).get_backend_name() == 'sqlite':
+        return {}
+
+    workers = max(1, config.get('DB_WORKERS', 1))
+    budget = config.get('DB_MAX_CONNECTIONS', 100) - config.get('DB_RESERVED_CONNECTIONS', 5)
+    per_worker = max(1, budget // workers)
+    pool_size = min(per_worker, config.get('DB_POOL_SIZE', 5))
+    return {
+        'pool_size': pool_size,
+        'max_overflow': per_worker - pool_size,
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True
+    }
+
+def configure_pool(app):
+    """Set the pool options of the app's engines, keeping options set in the configuration"""
+    options = pool_options(app.config)
+    if options:
+        explicit = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**options, **explicit}
+
+def dispose_engines(app):
+    """Drop the pooled connections inherited from the parent without closing them for it"""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+    # The counts of the parent are not this process's
+    with _counters_lock:
+        for counters in _counters.values():
+            counters.update(dict.fromkeys(counters, 0))
+
+def count_pool_events(name, engine):
+    """Count the connections opened, checked out and invalidated by an engine's pool"""
+    counters = _counters.setdefault(name, {'connects': 0, 'checkouts': 0, 'checkins': 0,
+                                           'invalidations': 0, 'max_checked_out': 0,
+                                           'checked_out': 0})
+
+    def count(field, delta=1):
+        with _counters_lock:
+            counters[field] += delta
+            if field == 'checkouts':
+                counters['checked_out'] += 1
+                counters['max_checked_out'] = max(counters['max_checked_out'],
+                                                  counters['checked_out'])
+            elif field == 'checkins':
+                counters['checked_out'] -= 1
+
+    event.listen(engine, 'connect', lambda *args: count('connects'))
+    event.listen(engine, 'checkout', lambda *args: count('checkouts'))
+    event.listen(engine, 'checkin', lambda *args: count('checkins'))
+    event.listen(engine, 'invalidate', lambda *args: count('invalidations'))
+
+def init_pool_stats(app):
+    """Count the pool events of the app's engines"""
+    with app.app_context():
+        for name, engine in db.engines.items():
+            count_pool_events(name or 'default', engine)
+
+def pool_stats():
+    """
+    Get the pool state and event counts of this process.
+
+    Returns:
+        A dict with the process id and, per engine (bind key or
+        'default'), the pool class, its options, the connections currently
+        in the pool and checked out, and the event counts since the start
+    """
+    engines = {}
+    for name, engine in db.engines.items():
+        name = name or 'default'
+        pool = engine.pool
+        stats = {'pool': type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                max_overflow=pool._max_overflow,
+                timeout=pool.timeout(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=max(0, pool.overflow())
+            )
+        with _counters_lock:
+            counts = dict(_counters.get(name, {}))
+        counts.pop('checked_out', None)
+        stats.update(counts)
+        engines[name] = stats
+    return {'pid': os.getpid(), 'engines': engines}
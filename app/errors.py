@@ -55,9 +55,12 @@ def register_error_handlers(app):
     @app.errorhandler(429)
     def too_many_requests_error(error):
         """Handle 429 errors"""
+        # Keep the Retry-After header set by the rate limiter
+        headers = [(name, value) for name, value in error.get_headers() if name == 'Retry-After']
         if request.path.startswith('/api/'):
-            return jsonify({'error': 'Too many requests', 'message': 'Rate limit exceeded'}), 429
-        return render_template('errors/429.html'), 429
+            body = {'error': 'Too many requests', 'message': 'Rate limit exceeded'}
+            return jsonify(body), 429, headers
+        return render_template('errors/429.html'), 429, headers
 
     @app.errorhandler(500)
     def internal_error(error):
@@ -0,0 +1,84 @@
+"""
+JSON providers for API responses.
+
+The provider is selected with the JSON_PROVIDER setting:
+
+- 'auto' uses orjson when it is installed and the standard library otherwise
+- 'orjson' requires orjson
+- 'stdlib' always uses the standard library
+
+Both providers produce the same documents: keys are sorted and dates are
+serialized as ISO 8601 strings.
+"""
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+
+# Try to import orjson, but don't fail if it's not installed
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Standard library JSON provider that serializes dates as ISO 8601"""
+
+    @staticmethod
+    def default(o):
+        """Serialize values the json module does not support"""
+        if isinstance(o, date):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+class OrjsonProvider(StdlibJSONProvider):
+    """JSON provider backed by orjson, which serializes datetimes natively"""
+
+    def _options(self, indent=None):
+        """Get the orjson option flags matching the provider settings"""
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        """Serialize data as a JSON string"""
+        # Options orjson does not support (e.g. the session serializer's) go to the json module
+        if set(kwargs) - {'indent'}:
+            return super().dumps(obj, **kwargs)
+        option = self._options(kwargs.get('indent'))
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        """Deserialize data from a JSON string or bytes"""
+        # object_hook is needed to untag session values, which orjson cannot call
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """Serialize data to a JSON response without an intermediate str"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._options(indent))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+JSON_PROVIDERS = {
+    'stdlib': StdlibJSONProvider,
+    'orjson': OrjsonProvider
+}
+
+def init_json_provider(app):
+    """Install the JSON provider selected by the JSON_PROVIDER setting"""
+    name = app.config.get('JSON_PROVIDER', 'auto')
+    if name == 'auto':
+        name = 'orjson' if ORJSON_AVAILABLE else 'stdlib'
+
+    if name not in JSON_PROVIDERS:
+        raise ValueError(f'Unknown JSON provider: {name}')
+    if name == 'orjson' and not ORJSON_AVAILABLE:
+        raise RuntimeError("JSON_PROVIDER is 'orjson' but orjson is not installed. "
+                           "Install it with 'pip install orjson'.")
+
+    app.json = JSON_PROVIDERS[name](app)
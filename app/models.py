@@ -3,21 +3,72 @@ import jwt
 from time import time
 from flask import current_app
 from flask_login import UserMixin
+from sqlalchemy.orm import joinedload, load_only, selectinload, validates
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db, login_manager
+from app.utils.html_utils import render_content
 
 @login_manager.user_loader
 def load_user(user_id):
     """Load a user from the database"""
     return User.query.get(int(user_id))
 
+class SerializerMixin:
+    """Mixin providing field selection for API serialization
+
+    Models list their public fields in API_FIELDS and a lighter default set
+    in SUMMARY_FIELDS. Fields that are not plain columns are serialized by
+    RELATED_FIELDS, which maps the field name to a function and the columns
+    that function needs.
+    """
+    API_FIELDS = ()
+    SUMMARY_FIELDS = ()
+    RELATED_FIELDS = {}
+
+    @classmethod
+    def resolve_fields(cls, fields=None, view='full'):
+        """Validate a requested field list or view name and return the fields to serialize"""
+        if fields:
+            unknown = [field for field in fields if field not in cls.API_FIELDS]
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+            # Keep the canonical order and always include the primary key
+            return tuple(field for field in cls.API_FIELDS if field in fields or field == 'id')
+        if view == 'summary':
+            return cls.SUMMARY_FIELDS
+        if view == 'full':
+            return cls.API_FIELDS
+        raise ValueError(f'Unknown view: {view}')
+
+    @classmethod
+    def load_fields(cls, fields=None, *extra_columns):
+        """Build a loader option that only loads the columns needed for the given fields"""
+        columns = {'id', *extra_columns}
+        for field in fields or cls.API_FIELDS:
+            if field in cls.RELATED_FIELDS:
+                columns.update(cls.RELATED_FIELDS[field][1])
+            else:
+                columns.add(field)
+        return load_only(*(getattr(cls, column) for column in sorted(columns)))
+
+    def to_dict(self, fields=None):
+        """Convert the object to a dictionary for API responses"""
+        data = {}
+        for field in fields or self.API_FIELDS:
+            if field in self.RELATED_FIELDS:
+                data[field] = self.RELATED_FIELDS[field][0](self)
+            else:
+                value = getattr(self, field)
+                data[field] = value.isoformat() if isinstance(value, datetime) else value
+        return data
+
 # Association table for User and Role (many-to-many)
 user_roles = db.Table('user_roles',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
     db.Column('role_id', db.Integer, db.ForeignKey('role.id'), primary_key=True)
 )
 
-class User(db.Model, UserMixin):
+class User(SerializerMixin, db.Model, UserMixin):
     """User model for authentication and user management"""
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), index=True, unique=True)
@@ -62,20 +113,13 @@ class User(db.Model, UserMixin):
             return f"{self.first_name} {self.last_name}"
         return self.username
 
-    def to_dict(self):
-        """Convert user object to dictionary for API responses"""
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'first_name': self.first_name,
-            'last_name': self.last_name,
-            'bio': self.bio,
-            'profile_image': self.profile_image,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'role': self.role,
-            'roles': [role.name for role in self.roles]
-        }
+    # Fields available to API responses
+    API_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'bio',
+                  'profile_image', 'created_at', 'role', 'roles')
+    SUMMARY_FIELDS = ('id', 'username', 'profile_image', 'role')
+    RELATED_FIELDS = {
+        'roles': (lambda user: [role.name for role in user.roles], ())
+    }
 
     def get_reset_password_token(self, expires_in=3600):
         """Generate a token for password reset"""
@@ -128,7 +172,7 @@ class Role(db.Model):
     def __repr__(self):
         return f'<Role {self.name}>'
 
-class Page(db.Model):
+class Page(SerializerMixin, db.Model):
     """Page model for content management"""
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -136,7 +180,7 @@ class Page(db.Model):
     content = db.Column(db.Text, nullable=False)
     summary = db.Column(db.String(200))
     featured_image = db.Column(db.String(120))
-    is_published = db.Column(db.Boolean, default=False, index=True)
+    is_published = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     published_at = db.Column(db.DateTime, index=True)
@@ -144,33 +188,66 @@ class Page(db.Model):
     view_count = db.Column(db.Integer, default=0)
     meta_description = db.Column(db.String(160))
 
+    # Rendered from content whenever it is set (see render_content)
+    content_html = db.Column(db.Text)
+    word_count = db.Column(db.Integer, default=0)
+    reading_time = db.Column(db.Integer, default=0)  # Minutes
+
     # Relationships
     tags = db.relationship('Tag', secondary='page_tags', backref='pages')
 
+    # Listings filter on is_published and sort, so each sort key is indexed after it
+    __table_args__ = (
+        db.Index('ix_page_is_published_published_at', 'is_published', 'published_at'),
+        db.Index('ix_page_is_published_created_at', 'is_published', 'created_at'),
+        db.Index('ix_page_is_published_view_count', 'is_published', 'view_count'),
+    )
+
+    # Fields available to API responses
+    API_FIELDS = ('id', 'title', 'slug', 'content', 'summary', 'featured_image', 'is_published',
+                  'created_at', 'updated_at', 'published_at', 'author', 'tags')
+    SUMMARY_FIELDS = ('id', 'title', 'slug', 'summary', 'featured_image', 'published_at',
+                      'author', 'tags')
+    RELATED_FIELDS = {
+        'author': (lambda page: page.author.username, ('user_id',)),
+        'tags': (lambda page: [tag.name for tag in page.tags], ())
+    }
+
     def __repr__(self):
         return f'<Page {self.title}>'
 
-    def to_dict(self):
-        """Convert page object to dictionary for API responses"""
-        return {
-            'id': self.id,
-            'title': self.title,
-            'slug': self.slug,
-            'content': self.content,
-            'summary': self.summary,
-            'featured_image': self.featured_image,
-            'is_published': self.is_published,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'published_at': self.published_at.isoformat() if self.published_at else None,
-            'author': self.author.username,
-            'tags': [tag.name for tag in self.tags]
-        }
+    @validates('content')
+    def prerender_content(self, key, content):
+        """Render the HTML served to readers once, when the content is saved"""
+        self.content_html, self.word_count, self.reading_time = render_content(content)
+        return content
+
+    @classmethod
+    def query_for_listing(cls, fields=None, *extra_columns):
+        """
+        Query pages for a listing with the relations it needs loaded up front.
+
+        Authors are joined into the page query and tags are fetched with one
+        extra IN query, so serializing or rendering any number of pages runs
+        a constant number of queries. When fields are given, only the columns
+        and relations those fields need are loaded.
+        """
+        options = []
+        if fields:
+            options.append(cls.load_fields(fields, *extra_columns))
+        if not fields or 'author' in fields:
+            # Listings never show the author's roles, so skip their eager subquery
+            options.append(joinedload(cls.author).lazyload(User.roles))
+        if not fields or 'tags' in fields:
+            options.append(selectinload(cls.tags))
+        return cls.query.options(*options)
 
 # Association table for Page and Tag (many-to-many)
 page_tags = db.Table('page_tags',
     db.Column('page_id', db.Integer, db.ForeignKey('page.id'), primary_key=True),
-    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True)
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    # The primary key serves lookups by page, this one lookups by tag
+    db.Index('ix_page_tags_tag_id_page_id', 'tag_id', 'page_id')
 )
 
 class Tag(db.Model):
@@ -181,7 +258,7 @@ class Tag(db.Model):
     def __repr__(self):
         return f'<Tag {self.name}>'
 
-class Media(db.Model):
+class Media(SerializerMixin, db.Model):
     """Media model for file uploads"""
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False, index=True)
@@ -192,26 +269,24 @@ class Media(db.Model):
     path = db.Column(db.String(255), nullable=False)
     alt_text = db.Column(db.String(255))  # For accessibility
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    # The media library lists a user's files newest first
+    __table_args__ = (
+        db.Index('ix_media_user_id_created_at', 'user_id', 'created_at'),
+    )
+
+    # Fields available to API responses
+    API_FIELDS = ('id', 'filename', 'original_filename', 'file_type', 'file_size',
+                  'file_extension', 'path', 'alt_text', 'created_at', 'owner')
+    SUMMARY_FIELDS = ('id', 'filename', 'file_type', 'path', 'alt_text')
+    RELATED_FIELDS = {
+        'owner': (lambda media: media.owner.username, ('user_id',))
+    }
 
     def __repr__(self):
         return f'<Media {self.filename}>'
 
-    def to_dict(self):
-        """Convert media object to dictionary for API responses"""
-        return {
-            'id': self.id,
-            'filename': self.filename,
-            'original_filename': self.original_filename,
-            'file_type': self.file_type,
-            'file_size': self.file_size,
-            'file_extension': self.file_extension,
-            'path': self.path,
-            'alt_text': self.alt_text,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'owner': self.owner.username
-        }
-
 class PageVersion(db.Model):
     """PageVersion model for tracking page revisions"""
     id = db.Column(db.Integer, primary_key=True)
@@ -225,5 +300,9 @@ class PageVersion(db.Model):
     page = db.relationship('Page', backref='versions')
     user = db.relationship('User', backref='page_versions')
 
+    __table_args__ = (
+        db.Index('ix_page_version_page_id_created_at', 'page_id', 'created_at'),
+    )
+
     def __repr__(self):
         return f'<PageVersion {self.id} for Page {self.page_id}>'
@@ -0,0 +1,187 @@
+"""
+Request rate limiting.
+
+Limits are written as "<count>/<period>", e.g. "120/minute" or
+"10 per 30 seconds", and are configured per blueprint with
+RATELIMIT_BLUEPRINTS and per endpoint with RATELIMIT_ROUTES (or the
+rate_limit decorator). Requests over a limit are answered with 429 and a
+Retry-After header by the handler in app.errors.
+
+Counting uses a sliding window approximation: each client keeps the hit
+count of the current and the previous fixed window, and the previous
+count is weighted by how much of it still overlaps the sliding window.
+That is O(1) memory per client and limit, and the memory storage keeps
+at most RATELIMIT_MAX_KEYS counters, dropping the least recently used.
+
+Clients are identified by their address. Behind a reverse proxy every
+request comes from the proxy, so RATELIMIT_TRUSTED_PROXIES sets how many
+proxies' X-Forwarded-For entries are trusted to give the client address.
+
+RATELIMIT_STORAGE selects where counters live: 'memory' keeps them in the
+worker process, 'cache' stores them in the Flask cache so all workers
+share them (RedisCache in production, SimpleCache in tests).
+"""
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request
+from werkzeug.exceptions import TooManyRequests
+from werkzeug.middleware.proxy_fix import ProxyFix
+from app import cache
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+EXEMPT_ENVIRON_KEY = 'ratelimit.exempt'
+LIMIT_PATTERN = re.compile(r'^\s*(\d+)\s*(?:/|per)\s*(\d+)?\s*(second|minute|hour|day)s?\s*$')
+
+def parse_limit(limit):
+    """
+    Parse a limit string.
+
+    Returns:
+        A tuple of (count, window in seconds)
+
+    Raises:
+        ValueError: If the limit string is malformed
+    """
+    match = LIMIT_PATTERN.match(limit)
+    if not match:
+        raise ValueError(f'Invalid rate limit: {limit!r}')
+    count, multiplier, period = match.groups()
+    return int(count), int(multiplier or 1) * PERIODS[period]
+
+class MemoryStorage:
+    """Per-process counter storage, evicting the least recently used counters when full"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._counters = OrderedDict()  # key -> [window id, current count, previous count]
+        self._lock = threading.Lock()
+
+    def hit(self, key, window_id, window):
+        """Count a hit and return the (current, previous) window counts"""
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or counter[0] < window_id - 1:
+                counter = self._counters[key] = [window_id, 0, 0]
+            elif counter[0] == window_id - 1:
+                counter[:] = [window_id, 0, counter[1]]
+            self._counters.move_to_end(key)
+            while len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+
+            counter[1] += 1
+            return counter[1], counter[2]
+
+class CacheStorage:
+    """Counter storage in the Flask cache, shared by all workers"""
+
+    def hit(self, key, window_id, window):
+        """Count a hit and return the (current, previous) window counts"""
+        current_key = f'ratelimit/{key}/{window_id}'
+        # add() sets the expiry once; the backend's inc() is atomic on Redis
+        cache.add(current_key, 0, timeout=window * 2)
+        current = cache.cache.inc(current_key) or 1
+        previous = cache.get(f'ratelimit/{key}/{window_id - 1}') or 0
+        return current, int(previous)
+
+STORAGES = {
+    'memory': MemoryStorage,
+    'cache': CacheStorage
+}
+
+def init_rate_limiting(app):
+    """Set up the counter storage and register the before_request hook"""
+    if not app.config.get('RATELIMIT_ENABLED', True):
+        return
+
+    # Take the client address from the headers set by the trusted proxies
+    proxies = app.config.get('RATELIMIT_TRUSTED_PROXIES', 0)
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies)
+
+    storage = app.config.get('RATELIMIT_STORAGE', 'memory')
+    if storage not in STORAGES:
+        raise ValueError(f'Unknown rate limit storage: {storage}')
+    if storage == 'memory':
+        max_keys = app.config.get('RATELIMIT_MAX_KEYS', 100000)
+        app.extensions['ratelimit_storage'] = MemoryStorage(max_keys)
+    else:
+        app.extensions['ratelimit_storage'] = STORAGES[storage]()
+
+    # Fail at startup rather than on the first request
+    for limit in list(app.config.get('RATELIMIT_BLUEPRINTS', {}).values()) + \
+            list(app.config.get('RATELIMIT_ROUTES', {}).values()):
+        parse_limit(limit)
+
+    app.before_request(check_configured_limits)
+
+def client_key():
+    """Identify the client a request is counted against"""
+    return request.remote_addr or 'unknown'
+
+def check_limit(scope, limit):
+    """
+    Count the current request against a limit.
+
+    Raises:
+        TooManyRequests: If the limit is exceeded, with retry_after set
+    """
+    storage = current_app.extensions.get('ratelimit_storage')
+    # In-process requests (e.g. cache warming) are marked in the WSGI environ,
+    # which clients cannot set
+    if storage is None or request.environ.get(EXEMPT_ENVIRON_KEY):
+        return
+
+    count, window = parse_limit(limit)
+    now = time.time()
+    window_id = int(now // window)
+    elapsed = now - window_id * window
+
+    current, previous = storage.hit(f'{scope}:{client_key()}', window_id, window)
+    weight = 1 - elapsed / window
+    if previous * weight + current <= count:
+        return
+
+    # Seconds until the weighted count drops back under the limit
+    if current >= count or previous == 0:
+        retry_after = window - elapsed
+    else:
+        retry_after = window * (1 - (count - current) / previous) - elapsed
+    raise TooManyRequests(retry_after=max(1, math.ceil(retry_after)))
+
+def check_configured_limits():
+    """Apply the blueprint and route limits from the configuration"""
+    if request.endpoint is None or request.endpoint == 'static':
+        return
+
+    blueprint_limit = current_app.config.get('RATELIMIT_BLUEPRINTS', {}).get(request.blueprint)
+    if blueprint_limit:
+        check_limit(f'blueprint:{request.blueprint}', blueprint_limit)
+
+    route_limit = current_app.config.get('RATELIMIT_ROUTES', {}).get(request.endpoint)
+    if route_limit:
+        check_limit(f'route:{request.endpoint}', route_limit)
+
+def rate_limit(limit, methods=None):
+    """
+    Decorator limiting a view in addition to the configured limits.
+
+    Args:
+        limit: The limit string, e.g. "5/minute"
+        methods: Only count requests with these methods (all by default)
+    """
+    parse_limit(limit)
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if methods is None or request.method in methods:
+                check_limit(f'view:{request.endpoint}:{limit}', limit)
+            return f(*args, **kwargs)
+
+        return decorated
+
+    return decorator
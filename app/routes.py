@@ -1,18 +1,25 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from app import cache
+from app.caching import cached_view, request_audience
 from app.models import Page, User
 
 # Create blueprint
 main = Blueprint('main', __name__)
 
+# Page fields rendered by the listings of this blueprint
+INDEX_FIELDS = ('title', 'slug', 'summary', 'content', 'featured_image', 'published_at')
+SITEMAP_FIELDS = ('title', 'slug', 'published_at')
+
 @main.route('/')
 @main.route('/index')
-@cache.cached(timeout=60)  # Cache for 1 minute
+# Cache for 1 day per audience, refreshed in the background on changes
+@cached_view(86400, 'pages', audience=request_audience, stale_while_revalidate=True)
 def index():
     """Render the home page"""
     # Get the latest published pages
-    recent_pages = Page.query.filter_by(is_published=True).order_by(Page.published_at.desc()).limit(3).all()
+    recent_pages = Page.query_for_listing(INDEX_FIELDS).filter_by(is_published=True) \
+        .order_by(Page.published_at.desc()).limit(3).all()
     return render_template('index.html', title='Home', recent_pages=recent_pages)
 
 @main.route('/dashboard')
@@ -28,8 +35,9 @@ def api_docs():
     return render_template('api_docs.html', title='API Documentation')
 
 @main.route('/sitemap')
-@cache.cached(timeout=300)  # Cache for 5 minutes
+# Cache for 1 day per audience, refreshed in the background on changes
+@cached_view(86400, 'pages', audience=request_audience, stale_while_revalidate=True)
 def sitemap():
     """Generate a simple sitemap of all pages"""
-    pages = Page.query.filter_by(is_published=True).all()
+    pages = Page.query_for_listing(SITEMAP_FIELDS).filter_by(is_published=True).all()
     return render_template('sitemap.html', title='Sitemap', pages=pages)
@@ -0,0 +1,88 @@
+"""
+SQLite connection tuning.
+
+SQLite applies most settings per connection, so the pragmas of the profile
+selected with SQLITE_PRAGMA_PROFILE are run on every new connection of a
+SQLite engine. SQLITE_PRAGMAS overrides single pragmas of the profile.
+
+Profiles:
+
+- 'default': SQLite's defaults (rollback journal, writers block readers)
+- 'concurrent': WAL journal, so readers never block on a writer and a
+  writer never blocks on readers; synchronous=NORMAL, which is durable
+  in WAL mode except for the last commits on power loss; a 64MB page
+  cache, 256MB of memory-mapped I/O and temporary tables in memory.
+  Writers still take turns and wait up to busy_timeout for each other
+  instead of failing with "database is locked".
+- 'durable': 'concurrent' with synchronous=FULL, so every commit survives
+  a power loss
+
+The journal mode is stored in the database file, the other pragmas only
+last as long as the connection. In-memory databases ignore WAL and mmap.
+"""
+import re
+from sqlalchemy import event
+from app import db
+
+CONCURRENT_PRAGMAS = {
+    'busy_timeout': 5000,  # Milliseconds; set first so switching the journal mode waits for locks
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # Negative values are KiB
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY'
+}
+
+PRAGMA_PROFILES = {
+    'default': {},
+    'concurrent': CONCURRENT_PRAGMAS,
+    'durable': {**CONCURRENT_PRAGMAS, 'synchronous': 'FULL'}
+}
+
+NAME_PATTERN = re.compile(r'^\w+$')
+VALUE_PATTERN = re.compile(r'^-?\w+$')
+
+def get_pragmas(profile, overrides=None):
+    """
+    Get the pragmas of a profile with overrides applied.
+
+    Raises:
+        ValueError: If the profile is unknown or a pragma is malformed
+    """
+    if profile not in PRAGMA_PROFILES:
+        raise ValueError(f'Unknown SQLite pragma profile: {profile}')
+
+    pragmas = {**PRAGMA_PROFILES[profile], **(overrides or {})}
+    # Pragmas are formatted into SQL, so only plain names and values are accepted
+    for name, value in pragmas.items():
+        if not NAME_PATTERN.match(name) or not VALUE_PATTERN.match(str(value)):
+            raise ValueError(f'Invalid SQLite pragma: {name}={value}')
+    return pragmas
+
+def apply_pragmas(dbapi_connection, pragmas):
+    """Run pragmas on a DB-API connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+def listen_for_connections(engine, pragmas):
+    """Apply pragmas to every new connection of an engine"""
+    def set_pragmas(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+
+    event.listen(engine, 'connect', set_pragmas)
+
+def init_sqlite_pragmas(app):
+    """Apply the configured pragma profile to the SQLite engines of the app"""
+    pragmas = get_pragmas(app.config.get('SQLITE_PRAGMA_PROFILE', 'default'),
+                          app.config.get('SQLITE_PRAGMAS'))
+    if not pragmas:
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                listen_for_connections(engine, pragmas)
@@ -0,0 +1,141 @@
+"""
+Utility functions for database instrumentation.
+
+init_query_instrumentation() times every statement of the app's engines:
+
+- statements taking SLOW_DB_QUERY_TIME seconds or more are logged with
+  the shape of their parameters (types, not values), the endpoint and the
+  application frames that ran them
+- requests count their statements and database time, which are added to
+  the response as X-DB-Queries and X-DB-Time (ms) when QUERY_STATS_HEADER
+  is set
+- requests running more statements than their budget (QUERY_BUDGETS for
+  the endpoint, else QUERY_BUDGET) are logged, or fail with
+  QueryBudgetExceeded when QUERY_BUDGET_ACTION is 'raise' (for tests)
+"""
+import os
+import time
+import traceback
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from app import db
+
+# Frames below this directory are application code
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class QueryCounter:
+    """
+    Context manager counting the SQL statements executed by an engine.
+
+    Example::
+
+        with QueryCounter() as counter:
+            client.get('/api/pages')
+        assert counter.count == 3
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine
+        self.statements = []
+
+    @property
+    def count(self):
+        """Number of statements executed so far"""
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        if self.engine is None:
+            self.engine = db.engine
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+        return False
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a request runs more statements than its budget allows"""
+
+def parameters_shape(parameters, executemany=False):
+    """Describe statement parameters by their types, e.g. {'id': 'int'} or '3 x [int, str]'"""
+    if executemany:
+        return f'{len(parameters)} x {parameters_shape(parameters[0])}' if parameters else '0 x []'
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return '[' + ', '.join(type(value).__name__ for value in parameters) + ']'
+    return type(parameters).__name__
+
+def stack_summary(limit=5):
+    """Get the innermost application frames of the current stack, innermost first"""
+    frames = [frame for frame in traceback.extract_stack()[:-1]
+              if frame.filename.startswith(APP_ROOT) and frame.filename != __file__]
+    root = os.path.dirname(APP_ROOT)
+    return ' <- '.join(f'{os.path.relpath(frame.filename, root)}:{frame.lineno} in {frame.name}'
+                       for frame in reversed(frames[-limit:]))
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Start timing a statement"""
+    context._query_started = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Count a statement for the current request and log it if it was slow"""
+    started = getattr(context, '_query_started', None)
+    if started is None or not has_app_context():
+        return
+    duration = time.perf_counter() - started
+
+    if has_request_context() and 'db_query_count' in g:
+        g.db_query_count += 1
+        g.db_query_time += duration
+
+    threshold = current_app.config.get('SLOW_DB_QUERY_TIME')
+    if threshold is not None and duration >= threshold:
+        endpoint = request.endpoint if has_request_context() else None
+        current_app.logger.warning('Slow query (%.3fs) in %s: %s\nParameters: %s\nCalled from: %s',
+                                   duration, endpoint or 'no request', statement,
+                                   parameters_shape(parameters, executemany), stack_summary())
+
+def start_request_stats():
+    """Reset the statement count at the start of a request"""
+    g.db_query_count = 0
+    g.db_query_time = 0.0
+
+def finish_request_stats(response):
+    """
+    Add the statement count to the response and enforce the query budget.
+
+    Streamed responses (e.g. the exports) run their statements while the
+    body is sent, after this hook, so their budget is not checked and the
+    header only counts the statements run before streaming.
+    """
+    count = g.get('db_query_count')
+    if count is None:
+        return response
+
+    if current_app.config.get('QUERY_STATS_HEADER'):
+        response.headers['X-DB-Queries'] = str(count)
+        response.headers['X-DB-Time'] = f'{g.db_query_time * 1000:.1f}'
+
+    default_budget = current_app.config.get('QUERY_BUDGET')
+    budget = current_app.config.get('QUERY_BUDGETS', {}).get(request.endpoint, default_budget)
+    if budget is not None and count > budget and not response.is_streamed:
+        message = f'{request.endpoint} ran {count} queries, over its budget of {budget}'
+        if current_app.config.get('QUERY_BUDGET_ACTION') == 'raise':
+            raise QueryBudgetExceeded(message)
+        current_app.logger.warning(message)
+    return response
+
+def init_query_instrumentation(app):
+    """Time the statements of the app's engines and register the per-request hooks"""
+    with app.app_context():
+        for engine in db.engines.values():
+            if not event.contains(engine, 'before_cursor_execute', before_cursor_execute):
+                event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+    app.before_request(start_request_stats)
+    app.after_request(finish_request_stats)
@@ -0,0 +1,182 @@
+"""
+Rendering of page content to the HTML served to readers.
+
+Page content is HTML written by authors. render_content() runs once when
+the content is saved (see Page.content) and produces:
+
+- sanitized HTML: only allowed tags and attributes are kept, scripts,
+  styles and event handlers are dropped and links may only use safe
+  schemes
+- heading anchors: every heading gets a unique id derived from its text
+- lazily loaded images: img tags get loading="lazy" and decoding="async"
+- the word count and reading time of the text
+"""
+import math
+import re
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'caption', 'code', 'dd', 'del', 'div', 'dl', 'dt', 'em',
+    'figcaption', 'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'ins', 'kbd',
+    'li', 'mark', 'ol', 'p', 'pre', 's', 'small', 'span', 'strong', 'sub', 'sup', 'table', 'tbody',
+    'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul'
+}
+ALLOWED_ATTRIBUTES = {
+    '*': {'class', 'id', 'title'},
+    'a': {'href', 'rel', 'target'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+    'ol': {'start'}
+}
+ALLOWED_SCHEMES = {'', 'http', 'https', 'mailto'}
+URL_ATTRIBUTES = {'href', 'src'}
+
+# Tags dropped together with everything inside them
+DROPPED_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'svg',
+                'math'}
+VOID_TAGS = {'br', 'hr', 'img'}
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+
+WORDS_PER_MINUTE = 200
+WORD_PATTERN = re.compile(r'\w+(?:[\'’-]\w+)*')
+
+def anchor_id(text):
+    """Turn heading text into an id, e.g. 'Getting Started!' -> 'getting-started'"""
+    return re.sub(r'[^\w]+', '-', text.lower()).strip('-_') or 'section'
+
+def is_safe_url(url):
+    """Check that a URL does not use a dangerous scheme such as javascript:"""
+    # Browsers ignore whitespace and control characters inside schemes
+    cleaned = re.sub(r'[\x00-\x20]+', '', url)
+    try:
+        return urlsplit(cleaned).scheme.lower() in ALLOWED_SCHEMES
+    except ValueError:
+        return False
+
+class ContentRenderer(HTMLParser):
+    """Parser writing the sanitized HTML of page content"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.output = []
+        self.open_tags = []
+        self.dropping = []
+        self.ids = set()
+        self.heading = None  # (tag, output index of its start tag, attributes, text parts)
+        self.words = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self.dropping or tag in DROPPED_TAGS:
+            if tag in DROPPED_TAGS and tag not in VOID_TAGS:
+                self.dropping.append(tag)
+            return
+        if tag not in ALLOWED_TAGS:
+            return
+
+        attributes = self.clean_attributes(tag, attrs)
+        if tag == 'img':
+            attributes.update(loading='lazy', decoding='async')
+        if tag in HEADING_TAGS and self.heading is None:
+            # The id is set at the end tag, once the heading's text is known
+            self.heading = (tag, len(self.output), attributes, [])
+            self.output.append('')
+        else:
+            if 'id' in attributes:
+                attributes['id'] = self.unique_id(attributes['id'])
+            self.output.append(self.format_tag(tag, attributes))
+
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.dropping:
+            if tag == self.dropping[-1]:
+                self.dropping.pop()
+            return
+        if tag not in self.open_tags:
+            return
+
+        # Close tags left open inside this one
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.end_tag(open_tag)
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.dropping:
+            return
+        self.words += len(WORD_PATTERN.findall(data))
+        if self.heading is not None:
+            self.heading[3].append(data)
+        self.output.append(escape(data, quote=False))
+
+    def end_tag(self, tag):
+        """Write the end tag of an open tag"""
+        if self.heading is not None and self.heading[0] == tag:
+            _, index, attributes, text = self.heading
+            attributes['id'] = self.unique_id(attributes.get('id') or anchor_id(''.join(text)))
+            self.output[index] = self.format_tag(tag, attributes)
+            self.heading = None
+        self.output.append(f'</{tag}>')
+
+    def clean_attributes(self, tag, attrs):
+        """Keep the allowed attributes of a tag"""
+        allowed = ALLOWED_ATTRIBUTES['*'] | ALLOWED_ATTRIBUTES.get(tag, set())
+        attributes = {}
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRIBUTES and not is_safe_url(value):
+                continue
+            attributes[name] = value
+        if attributes.get('target') == '_blank':
+            attributes['rel'] = 'noopener noreferrer'
+        return attributes
+
+    def unique_id(self, value):
+        """Make an id unique within the content by numbering repeats"""
+        candidate, number = value, 1
+        while candidate in self.ids:
+            number += 1
+            candidate = f'{value}-{number}'
+        self.ids.add(candidate)
+        return candidate
+
+    @staticmethod
+    def format_tag(tag, attributes):
+        """Write a start tag"""
+        pairs = ''.join(f' {name}="{escape(value)}"' for name, value in attributes.items())
+        return f'<{tag}{pairs}>'
+
+    def render(self, content):
+        """Render content and return the sanitized HTML"""
+        self.feed(content)
+        self.close_document()
+        return ''.join(self.output)
+
+    def close_document(self):
+        """Flush buffered input and close the tags left open"""
+        self.close()
+        while self.open_tags:
+            self.end_tag(self.open_tags.pop())
+
+def render_content(content):
+    """
+    Render page content.
+
+    Returns:
+        A tuple of (sanitized HTML, word count, reading time in minutes)
+    """
+    renderer = ContentRenderer()
+    html = renderer.render(content or '')
+    reading_time = math.ceil(renderer.words / WORDS_PER_MINUTE) if renderer.words else 0
+    return html, renderer.words, reading_time
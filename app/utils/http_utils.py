@@ -0,0 +1,93 @@
+"""
+Utility functions for HTTP conditional requests.
+"""
+import hashlib
+from datetime import timezone
+from functools import wraps
+from flask import current_app, g, make_response, request
+
+# Content codings that app.compression appends to the ETag of compressed variants
+ETAG_ENCODING_SUFFIXES = ('gzip', 'br')
+
+def make_etag(*parts):
+    """
+    Build a strong ETag value from the parts identifying a resource version.
+
+    The request path and query string are included so that different
+    representations of the same resource (e.g. field selections or
+    pagination cursors) get different tags.
+
+    Args:
+        parts: Values identifying the version of the resource
+
+    Returns:
+        The ETag value (without quotes)
+    """
+    raw = '|'.join([request.path, request.query_string.decode(), *(str(part) for part in parts)])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def conditional(get_version):
+    """
+    Decorator answering conditional GET requests before the view runs.
+
+    get_version is called with the view arguments and returns a tuple of
+    (etag, last_modified) for the current version of the resource, or None
+    if the request should not be handled conditionally (e.g. the resource
+    does not exist or is not public). It should only run cheap queries,
+    as it is evaluated before the cache and the view.
+
+    Args:
+        get_version: Callable returning the resource version
+
+    Returns:
+        The decorated view function
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            version = get_version(**kwargs)
+            if version is None:
+                g.etag = None
+                return f(*args, **kwargs)
+
+            etag, last_modified = version
+            if last_modified is not None:
+                # HTTP dates have second precision and the database stores naive UTC values
+                last_modified = last_modified.replace(microsecond=0)
+                if last_modified.tzinfo is None:
+                    last_modified = last_modified.replace(tzinfo=timezone.utc)
+            g.etag = etag
+
+            if is_not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+                # Echo the variant the client holds (e.g. the compressed one)
+                etag = matching_etag(etag) or etag
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            return response
+
+        return decorated
+
+    return decorator
+
+def matching_etag(etag):
+    """Get the variant of an ETag listed in If-None-Match, or None"""
+    for candidate in (etag, *(f'{etag}-{suffix}' for suffix in ETAG_ENCODING_SUFFIXES)):
+        if request.if_none_match.contains(candidate):
+            return candidate
+    return None
+
+def is_not_modified(etag, last_modified):
+    """Check the request validators against the current version of a resource"""
+    # If-None-Match takes precedence over If-Modified-Since
+    if request.if_none_match:
+        return matching_etag(etag) is not None
+    if request.if_modified_since and last_modified is not None:
+        return last_modified <= request.if_modified_since
+    return False
@@ -0,0 +1,73 @@
+"""
+Utility functions for keyset (cursor) pagination.
+"""
+import base64
+import json
+from datetime import datetime
+from flask import current_app, request
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+def encode_cursor(*values):
+    """
+    Encode the sort key of the last row of a page into an opaque cursor.
+
+    Args:
+        values: The sort key values (datetimes are supported)
+
+    Returns:
+        A URL-safe cursor string
+    """
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, *types):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: The cursor string from the request
+        types: The expected type of each value (datetime or int)
+
+    Returns:
+        A tuple of decoded values
+
+    Raises:
+        InvalidCursor: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise InvalidCursor(cursor)
+
+        values = []
+        for value, value_type in zip(payload, types):
+            if value is None:
+                values.append(None)
+            elif value_type is datetime:
+                values.append(datetime.fromisoformat(value))
+            else:
+                values.append(value_type(value))
+        return tuple(values)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(cursor) from e
+
+def get_page_limit():
+    """
+    Get the requested page size, clamped to the configured maximum.
+
+    Returns:
+        The number of rows to return
+
+    Raises:
+        ValueError: If the limit is not a positive integer
+    """
+    default = current_app.config.get('API_PAGE_SIZE', 20)
+    maximum = current_app.config.get('API_MAX_PAGE_SIZE', 100)
+    limit = int(request.args.get('limit', default))
+    if limit < 1:
+        raise ValueError(limit)
+    return min(limit, maximum)
@@ -0,0 +1,104 @@
+"""
+Utility functions for caching verified API tokens.
+"""
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+class ApiPrincipal:
+    """Lightweight stand-in for a User authenticated by an API token"""
+
+    def __init__(self, id, role, roles, is_active):
+        self.id = id
+        self.role = role
+        self.roles = frozenset(roles)
+        self.is_active = is_active
+
+    @classmethod
+    def from_user(cls, user):
+        """Build a principal from a User"""
+        return cls(user.id, user.role, [role.name for role in user.roles], bool(user.is_active))
+
+    def is_admin(self):
+        """Check if the principal has admin role (same rule as User.is_admin)"""
+        return self.role == 'admin' or 'admin' in self.roles
+
+    def __repr__(self):
+        return f'<ApiPrincipal {self.id}>'
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified tokens.
+
+    Entries expire after the configured TTL or when the token itself
+    expires, whichever comes first. All operations are O(1) except
+    invalidate_user, which is proportional to the user's cached tokens.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # token -> (principal, expires_at)
+        self._tokens_by_user = {}  # user id -> set of tokens
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """Get the principal for a token, or None if it is not cached or has expired"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+
+            principal, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(token)
+                return None
+
+            self._entries.move_to_end(token)
+            return principal
+
+    def set(self, token, principal, token_exp):
+        """Cache a verified token until the earlier of its expiry and the TTL"""
+        expires_at = min(token_exp, time.time() + self.ttl)
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (principal, expires_at)
+            self._tokens_by_user.setdefault(principal.id, set()).add(token)
+
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id):
+        """Drop every cached token of a user"""
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._remove(token)
+
+    def clear(self):
+        """Drop every cached token"""
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, token):
+        principal, _ = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(principal.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[principal.id]
+
+def get_token_cache():
+    """Get the token cache of the current application, creating it on first use"""
+    token_cache = current_app.extensions.get('token_cache')
+    if token_cache is None:
+        token_cache = current_app.extensions.setdefault('token_cache', TokenCache(
+            maxsize=current_app.config.get('API_TOKEN_CACHE_SIZE', 1024),
+            ttl=current_app.config.get('API_TOKEN_CACHE_TTL', 300)
+        ))
+    return token_cache
@@ -0,0 +1,121 @@
+"""
+Write-behind counting of page views.
+
+Updating Page.view_count on every view would make each reader a writer,
+and writers take turns on SQLite. Instead count_views() adds views to an
+in-memory counter of the worker process, and flush_view_counts() adds the
+counts of all pages to the database with one UPDATE ... CASE statement per
+batch of pages.
+
+The counter is flushed at the end of a request once
+VIEW_COUNT_FLUSH_INTERVAL seconds have passed or VIEW_COUNT_MAX_PENDING
+views are buffered, and when a gunicorn worker exits. A crashed worker
+therefore loses at most one interval (or that many views) of counts.
+
+The flush runs after the response is built and writes on a connection of
+its own, so it neither commits the request's session nor counts against
+the request's query budget. View counts are not content, so flushing them
+neither touches updated_at nor invalidates cached views.
+"""
+import os
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from flask import current_app, make_response, request
+from sqlalchemy import case, func, update
+from app import db
+from app.models import Page
+from app.ratelimit import EXEMPT_ENVIRON_KEY
+
+# Views of this process not yet written to the database, by page slug
+_pending = Counter()
+_pending_pid = None
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+def record_view(slug):
+    """Count a view of a page"""
+    global _pending_pid
+    with _pending_lock:
+        # A forked worker must not write the views counted by its parent
+        if _pending_pid != os.getpid():
+            _pending.clear()
+            _pending_pid = os.getpid()
+        _pending[slug] += 1
+
+def flush_due_view_counts(exc=None):
+    """Flush the buffered views at the end of a request if they are due"""
+    max_pending = current_app.config.get('VIEW_COUNT_MAX_PENDING', 1000)
+    interval = current_app.config.get('VIEW_COUNT_FLUSH_INTERVAL', 30)
+    with _pending_lock:
+        due = _pending and (sum(_pending.values()) >= max_pending
+                            or time.monotonic() - _last_flush >= interval)
+    if due:
+        flush_view_counts()
+
+def flush_view_counts():
+    """
+    Add the buffered views to Page.view_count.
+
+    Returns:
+        The number of views written
+    """
+    global _last_flush
+    with _pending_lock:
+        if _pending_pid != os.getpid():
+            return 0
+        counts = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not counts:
+        return 0
+
+    page = Page.__table__
+    slugs = list(counts)
+    batch_size = current_app.config.get('BULK_BATCH_SIZE', 500)
+    try:
+        # A connection of its own, so the session of the current request is left alone
+        with db.engine.begin() as connection:
+            for start in range(0, len(slugs), batch_size):
+                batch = {slug: counts[slug] for slug in slugs[start:start + batch_size]}
+                added = case(batch, value=page.c.slug, else_=0)
+                # updated_at is kept, so page ETags do not change with the view count
+                connection.execute(update(page).where(page.c.slug.in_(batch)).values(
+                    view_count=func.coalesce(page.c.view_count, 0) + added,
+                    updated_at=page.c.updated_at))
+    except Exception:
+        # Keep the views for the next flush
+        with _pending_lock:
+            _pending.update(counts)
+        current_app.logger.exception('Failed to flush page view counts')
+        return 0
+    return sum(counts.values())
+
+def count_views(f):
+    """
+    Decorator counting successful GET requests of a page view.
+
+    Place it above cached_view, so views served from the cache are
+    counted too. The view must take the page slug as its slug argument.
+    In-process requests (e.g. cache warming) are not counted.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        response = make_response(f(*args, **kwargs))
+        if request.environ.get(EXEMPT_ENVIRON_KEY):
+            return response
+        if request.method == 'GET' and response.status_code == 200:
+            record_view(kwargs['slug'])
+        return response
+
+    return decorated
+
+def init_view_counts(app):
+    """Register the end of request flush of the buffered views"""
+    app.teardown_request(flush_due_view_counts)
+
+def popular_pages(limit=10, fields=None):
+    """Get the most viewed published pages, with their listing relations loaded"""
+    return Page.query_for_listing(fields, 'view_count').filter_by(is_published=True) \
+        .order_by(Page.view_count.desc(), Page.id.desc()).limit(limit).all()
@@ -0,0 +1,77 @@
+"""
+Micro-benchmark comparing the JSON providers on /api/pages payloads.
+
+Builds page lists shaped like the GET /api/pages response (full pages with
+HTML content, author and tags) and times serializing them into a response
+with each available provider.
+
+Usage:
+    python -m benchmarks.json_provider_bench [--pages 20 100] [--repeat 200]
+
+(run from the project root, so the app package is importable)
+"""
+import argparse
+import timeit
+from datetime import datetime, timedelta, timezone
+from app import create_app
+from app.json_provider import JSON_PROVIDERS, ORJSON_AVAILABLE
+from app.models import Page, Tag, User
+
+PARAGRAPH = ('<p>Lorem ipsum dolor sit amet, <strong>consectetur</strong> adipiscing elit, '
+             'sed do eiusmod tempor incididunt ut labore et dolore magna aliqua. '
+             '<a href="/content/page/example">Ut enim ad minim veniam</a>.</p>\n')
+
+def build_payload(count):
+    """Build a pages response body with the given number of pages"""
+    author = User(username='author')
+    tags = [Tag(name=name) for name in ('General', 'Tutorial', 'News')]
+    now = datetime.now(timezone.utc)
+
+    pages = []
+    for i in range(count):
+        page = Page(
+            id=i + 1,
+            title=f'Benchmark page {i}',
+            slug=f'benchmark-page-{i}',
+            content=f'<h2>Section {i}</h2>\n' + PARAGRAPH * 20,
+            summary='A realistic page used to benchmark JSON serialization.',
+            is_published=True,
+            created_at=now - timedelta(days=i),
+            updated_at=now - timedelta(hours=i),
+            published_at=now - timedelta(days=i)
+        )
+        page.author = author
+        page.tags = tags[:i % 3 + 1]
+        pages.append(page.to_dict())
+    return {'pages': pages, 'next': 'eyJuZXh0IjoiY3Vyc29yIn0'}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pages', type=int, nargs='+', default=[20, 100])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    providers = {name: cls(app) for name, cls in JSON_PROVIDERS.items()
+                 if name != 'orjson' or ORJSON_AVAILABLE}
+    if not ORJSON_AVAILABLE:
+        print('orjson is not installed; only the stdlib provider is measured.')
+
+    with app.app_context():
+        for count in args.pages:
+            payload = build_payload(count)
+            size = len(providers['stdlib'].dumps(payload)) // 1024
+            print(f'\n{count} pages per response ({size} KiB)')
+
+            timings = {}
+            for name, provider in providers.items():
+                seconds = min(timeit.repeat(lambda: provider.response(payload),
+                                            number=args.repeat, repeat=5))
+                timings[name] = seconds / args.repeat * 1000
+                print(f'  {name:<8} {timings[name]:8.3f} ms per response')
+
+            if 'orjson' in timings:
+                print(f'  speedup  {timings["stdlib"] / timings["orjson"]:8.1f}x')
+
+if __name__ == '__main__':
+    main()
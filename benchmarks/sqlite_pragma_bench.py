@@ -0,0 +1,114 @@
+"""
+Benchmark of SQLite read/write concurrency per pragma profile.
+
+Runs reader and writer processes (like gunicorn workers) against a fresh
+database file for each profile of app.sqlite_pragmas and reports the
+operations per second and the operations that failed with "database is
+locked". Readers select the latest pages like the listings, writers insert
+a page and update another in one transaction like the editors.
+
+Usage:
+    python -m benchmarks.sqlite_pragma_bench [--readers 4] [--writers 2] [--seconds 5]
+
+(run from the project root, so the app package is importable)
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+from app.sqlite_pragmas import PRAGMA_PROFILES, apply_pragmas, get_pragmas
+
+CONTENT = '<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>\n' * 40
+INSERT_PAGE = 'INSERT INTO page (title, content, published_at, view_count) VALUES (?, ?, ?, 0)'
+
+def connect(path, profile):
+    """Open a connection like SQLAlchemy's pysqlite dialect does and apply the profile"""
+    connection = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    apply_pragmas(connection, get_pragmas(profile))
+    return connection
+
+def setup(path, profile, rows=1000):
+    """Create the database with some pages"""
+    connection = connect(path, profile)
+    connection.execute('CREATE TABLE page (id INTEGER PRIMARY KEY, title TEXT, content TEXT, '
+                       'published_at REAL, view_count INTEGER)')
+    connection.execute('CREATE INDEX ix_page_published_at ON page (published_at)')
+    connection.executemany(INSERT_PAGE, [(f'Page {i}', CONTENT, i) for i in range(rows)])
+    connection.commit()
+    connection.close()
+
+def read(connection):
+    """Read the latest pages and the page count"""
+    connection.execute('SELECT id, title, content FROM page '
+                       'ORDER BY published_at DESC LIMIT 20').fetchall()
+    connection.execute('SELECT count(*) FROM page').fetchone()
+
+def write(connection):
+    """Insert a page and update another in one transaction"""
+    now = time.time()
+    connection.execute(INSERT_PAGE, ('New page', CONTENT, now))
+    connection.execute('UPDATE page SET view_count = view_count + 1 WHERE id = ?',
+                       (int(now * 1000) % 1000 + 1,))
+    connection.commit()
+
+def worker(path, profile, operation, deadline, results):
+    """Run an operation until the deadline, counting successes and lock errors"""
+    connection = connect(path, profile)
+    done = locked = 0
+    while time.time() < deadline:
+        try:
+            operation(connection)
+            done += 1
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            connection.rollback()
+            locked += 1
+    connection.close()
+    results.put((operation.__name__, done, locked))
+
+def run(profile, readers, writers, seconds):
+    """Benchmark one profile and return its totals per operation"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.db')
+        setup(path, profile)
+
+        results = multiprocessing.Queue()
+        deadline = time.time() + seconds
+        operations = [read] * readers + [write] * writers
+        processes = [multiprocessing.Process(target=worker,
+                                             args=(path, profile, operation, deadline, results))
+                     for operation in operations]
+        for process in processes:
+            process.start()
+        totals = {'read': [0, 0], 'write': [0, 0]}
+        for _ in processes:
+            name, done, locked = results.get()
+            totals[name][0] += done
+            totals[name][1] += locked
+        for process in processes:
+            process.join()
+        return totals
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--profiles', nargs='+', default=list(PRAGMA_PROFILES))
+    args = parser.parse_args()
+
+    print(f'{args.readers} readers, {args.writers} writers, {args.seconds}s per profile')
+    print(f"{'profile':<12} {'reads/s':>10} {'writes/s':>10} "
+          f"{'read locked':>12} {'write locked':>13}")
+    for profile in args.profiles:
+        totals = run(profile, args.readers, args.writers, args.seconds)
+        reads, read_locked = totals['read']
+        writes, write_locked = totals['write']
+        print(f"{profile:<12} {reads / args.seconds:>10.0f} {writes / args.seconds:>10.0f} "
+              f"{read_locked:>12} {write_locked:>13}")
+
+if __name__ == '__main__':
+    main()
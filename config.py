@@ -14,6 +14,19 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # 'default', 'concurrent' or 'durable'
+    SQLITE_PRAGMA_PROFILE = os.environ.get('SQLITE_PRAGMA_PROFILE', 'default')
+    SQLITE_PRAGMAS = {}  # Overrides of single pragmas of the profile, e.g. {'busy_timeout': 10000}
+
+    # Connection pool of each worker process (server databases only, see app/db_pool.py)
+    # Worker processes sharing the connection budget
+    DB_WORKERS = int(os.environ.get('WEB_CONCURRENCY') or 1)
+    # Connections the database allows the app
+    DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS') or 100)
+    DB_RESERVED_CONNECTIONS = 5  # Connections kept free for CLI commands, migrations and upkeep
+    DB_POOL_SIZE = 5  # Persistent connections per worker at most; the rest of its share is overflow
+    DB_POOL_TIMEOUT = 10  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = 1800  # Seconds before a connection is replaced
 
     # Mail server settings (for password reset, etc.)
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'localhost')
@@ -34,14 +47,67 @@ class Config:
     REMEMBER_COOKIE_SECURE = False  # Set to True in production
     REMEMBER_COOKIE_HTTPONLY = True
 
+    # API pagination settings
+    API_PAGE_SIZE = 20  # Default number of items per page
+    API_MAX_PAGE_SIZE = 100  # Upper bound for the 'limit' parameter
+    EXPORT_BATCH_SIZE = 500  # Rows fetched per batch by the streaming export endpoints
+    BULK_BATCH_SIZE = 500  # Pages written per commit by the bulk endpoints
+    BULK_MAX_ITEMS = 10000  # Maximum number of pages in one bulk request
+    API_TOKEN_CACHE_SIZE = 1024  # Verified API tokens kept per worker
+    API_TOKEN_CACHE_TTL = 60  # Seconds a verified token is trusted without a database check
+
+    # JSON provider for API responses: 'auto' (orjson if installed), 'orjson' or 'stdlib'
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto')
+
+    # Response compression settings
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 500  # Bytes; smaller bodies are sent as is
+    COMPRESS_LEVEL = 6  # gzip level
+    COMPRESS_BR_LEVEL = 4  # brotli quality, used when the brotli package is installed
+    COMPRESS_MIMETYPES = ['text/html', 'text/css', 'text/plain', 'text/xml', 'text/csv',
+                          'application/json', 'application/javascript', 'application/xml']
+
+    # Rate limiting settings (limits are "<count>/<second|minute|hour|day>")
+    RATELIMIT_ENABLED = True
+    # 'memory' (per worker) or 'cache' (shared through the cache backend)
+    RATELIMIT_STORAGE = 'memory'
+    RATELIMIT_MAX_KEYS = 100000  # Counters kept per worker by the 'memory' storage
+    RATELIMIT_TRUSTED_PROXIES = 0  # Reverse proxies whose X-Forwarded-For entries are trusted
+    RATELIMIT_BLUEPRINTS = {
+        'api': '600/minute'
+    }
+    RATELIMIT_ROUTES = {
+        'api.get_pages': '120/minute',
+        'content.page': '120/minute'
+    }
+
     # Caching settings
     CACHE_TYPE = 'SimpleCache'  # Use 'RedisCache' in production
     CACHE_DEFAULT_TIMEOUT = 300  # 5 minutes
     CACHE_THRESHOLD = 500  # Maximum number of items the cache will store
+    CACHE_STALE_GRACE = 60  # Seconds an expired view stays available while it is rebuilt
+    CACHE_LOCK_TIMEOUT = 30  # Seconds a worker may hold the rebuild lock of a view
+    CACHE_LOCK_WAIT = 3  # Seconds other workers wait for a rebuilt view before rendering it too
+    CACHE_REFRESH_WORKERS = 2  # Threads per worker refreshing stale views in the background
+    CACHE_LOCAL_MAX_ENTRIES = 1024  # Entries kept in the per-process tier of TwoTierRedisCache
+    CACHE_LOCAL_MAX_BYTES = 16 * 1024 * 1024  # Serialized bytes kept in the per-process tier
+    CACHE_LOCAL_TTL = 5  # Seconds a per-process entry is trusted without an invalidation message
+    # Key prefixes of counters and locks, kept only in Redis so their writes publish nothing
+    CACHE_LOCAL_EXCLUDE = ('ratelimit/', 'stats/', 'lock/')
+    CACHE_STATS_FLUSH_INTERVAL = 10  # Seconds between writes of a worker's stats to shared counters
+    CACHE_WARM_WORKERS = 4  # Concurrent requests of `flask cache-warm`
+
+    # Page view counting (buffered per worker, see app/view_counts.py)
+    VIEW_COUNT_FLUSH_INTERVAL = 30  # Seconds between writes of the buffered views
+    VIEW_COUNT_MAX_PENDING = 1000  # Buffered views that trigger an early write
 
     # Performance settings
     SQLALCHEMY_RECORD_QUERIES = True  # Set to False in production
-    SLOW_DB_QUERY_TIME = 0.5  # Time in seconds after which a query is considered slow
+    SLOW_DB_QUERY_TIME = 0.5  # Seconds after which a query is logged as slow (None disables)
+    QUERY_STATS_HEADER = True  # Add X-DB-Queries and X-DB-Time (ms) to responses
+    QUERY_BUDGET = 50  # Queries a request may run before it is reported (None disables)
+    QUERY_BUDGETS = {}  # Budgets of single endpoints, e.g. {'api.get_pages': 5}
+    QUERY_BUDGET_ACTION = 'warn'  # 'warn' logs requests over budget, 'raise' fails them
 
     # Server settings
     SERVER_NAME = os.environ.get('SERVER_NAME')
@@ -78,6 +144,9 @@ class TestingConfig(Config):
     # Use in-memory database for testing
     SQLALCHEMY_DATABASE_URI = 'sqlite://'
 
+    # Fail requests running more queries than their budget
+    QUERY_BUDGET_ACTION = 'raise'
+
     # Disable CSRF protection in tests
     WTF_CSRF_ENABLED = False
 
@@ -95,12 +164,21 @@ class ProductionConfig(Config):
     SESSION_COOKIE_SECURE = True
     SESSION_COOKIE_HTTPONLY = True
 
-    # Use Redis for caching in production
-    CACHE_TYPE = 'RedisCache'
+    # Use Redis for caching in production, with a per-process tier for hot keys
+    CACHE_TYPE = 'app.cache_backend.TwoTierRedisCache'
     CACHE_REDIS_URL = os.environ.get('REDIS_URL')
 
+    # Share rate limit counters between workers through Redis
+    RATELIMIT_STORAGE = 'cache'
+    # Count clients by the address nginx forwards, not nginx's own
+    RATELIMIT_TRUSTED_PROXIES = int(os.environ.get('RATELIMIT_TRUSTED_PROXIES', 1))
+
+    # Let readers and writers of SQLite databases work concurrently across workers
+    SQLITE_PRAGMA_PROFILE = os.environ.get('SQLITE_PRAGMA_PROFILE', 'concurrent')
+
     # Performance settings
     SQLALCHEMY_RECORD_QUERIES = False
+    QUERY_STATS_HEADER = False
 
     # Use HTTPS in production
     PREFERRED_URL_SCHEME = 'https'
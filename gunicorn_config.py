@@ -5,13 +5,17 @@ This file contains settings for the Gunicorn WSGI server in production.
 
 import multiprocessing
 import os
+import subprocess
+import sys
 
 # Server socket
 bind = "127.0.0.1:8000"
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
+workers = int(os.environ.get('WEB_CONCURRENCY') or multiprocessing.cpu_count() * 2 + 1)
+# The app divides its database connection budget between the workers
+os.environ['WEB_CONCURRENCY'] = str(workers)
 worker_class = 'sync'
 worker_connections = 1000
 timeout = 30
@@ -28,6 +32,9 @@ user = None
 group = None
 tmp_upload_dir = None
 
+# Warm the cached views once the server is ready (set CACHE_WARM_ON_START=1)
+warm_cache_on_start = os.environ.get('CACHE_WARM_ON_START', '').lower() in ('1', 'true', 'yes')
+
 # Logging
 errorlog = 'logs/gunicorn-error.log'
 accesslog = 'logs/gunicorn-access.log'
@@ -53,12 +60,26 @@ def when_ready(server):
     # Create log directory if it doesn't exist
     os.makedirs('logs', exist_ok=True)
 
+    # Warm in a separate process so the master neither blocks nor loads the app before forking
+    if warm_cache_on_start:
+        server.log.info("Warming cached views")
+        subprocess.Popen([sys.executable, '-m', 'flask', 'cache-warm'],
+                         env={'FLASK_APP': 'run.py', **os.environ})
+
 def post_fork(server, worker):
     """
     Called just after a worker has been forked.
     """
     server.log.info("Worker spawned (pid: %s)", worker.pid)
 
+    # With preload_app the master may have opened connections; each worker needs its own
+    if server.cfg.preload_app:
+        from flask import Flask
+        from app.db_pool import dispose_engines
+        application = worker.app.wsgi()
+        if isinstance(application, Flask):
+            dispose_engines(application)
+
 def pre_fork(server, worker):
     """
     Called just prior to forking the worker subprocess.
@@ -88,7 +109,13 @@ def worker_exit(server, worker):
     """
     Called just after a worker has been exited, in the worker process.
     """
-    pass
+    # Write the page views buffered by the worker
+    from flask import Flask
+    from app.view_counts import flush_view_counts
+    application = worker.app.wsgi()
+    if isinstance(application, Flask):
+        with application.app_context():
+            flush_view_counts()
 
 def child_exit(server, worker):
     """
@@ -0,0 +1,41 @@
+"""precomputed page html
+
+Revision ID: 5c2f8e1d9b47
+Revises: a1aeea43bee8
+Create Date: 2026-10-18 03:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.utils.html_utils import render_content
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2f8e1d9b47'
+down_revision = 'a1aeea43bee8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('page', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_html', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('word_count', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('reading_time', sa.Integer(), nullable=True))
+
+    # Render the content of existing pages
+    page = sa.table('page', sa.column('id', sa.Integer), sa.column('content', sa.Text),
+                    sa.column('content_html', sa.Text), sa.column('word_count', sa.Integer),
+                    sa.column('reading_time', sa.Integer))
+    connection = op.get_bind()
+    for page_id, content in connection.execute(sa.select(page.c.id, page.c.content)).all():
+        content_html, word_count, reading_time = render_content(content)
+        connection.execute(page.update().where(page.c.id == page_id).values(
+            content_html=content_html, word_count=word_count, reading_time=reading_time))
+
+
+def downgrade():
+    with op.batch_alter_table('page', schema=None) as batch_op:
+        batch_op.drop_column('reading_time')
+        batch_op.drop_column('word_count')
+        batch_op.drop_column('content_html')
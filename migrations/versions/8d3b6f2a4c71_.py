@@ -0,0 +1,59 @@
+"""composite listing indexes
+
+Revision ID: 8d3b6f2a4c71
+Revises: 5c2f8e1d9b47
+Create Date: 2026-10-18 04:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3b6f2a4c71'
+down_revision = '5c2f8e1d9b47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The composite indexes start with is_published and user_id, which makes
+    # the single column indexes on them redundant
+    with op.batch_alter_table('page', schema=None) as batch_op:
+        batch_op.drop_index('ix_page_is_published')
+        batch_op.create_index('ix_page_is_published_published_at', ['is_published', 'published_at'],
+                              unique=False)
+        batch_op.create_index('ix_page_is_published_created_at', ['is_published', 'created_at'],
+                              unique=False)
+        batch_op.create_index('ix_page_is_published_view_count', ['is_published', 'view_count'],
+                              unique=False)
+
+    with op.batch_alter_table('page_tags', schema=None) as batch_op:
+        batch_op.create_index('ix_page_tags_tag_id_page_id', ['tag_id', 'page_id'], unique=False)
+
+    with op.batch_alter_table('page_version', schema=None) as batch_op:
+        batch_op.create_index('ix_page_version_page_id_created_at', ['page_id', 'created_at'],
+                              unique=False)
+
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.drop_index('ix_media_user_id')
+        batch_op.create_index('ix_media_user_id_created_at', ['user_id', 'created_at'],
+                              unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.drop_index('ix_media_user_id_created_at')
+        batch_op.create_index('ix_media_user_id', ['user_id'], unique=False)
+
+    with op.batch_alter_table('page_version', schema=None) as batch_op:
+        batch_op.drop_index('ix_page_version_page_id_created_at')
+
+    with op.batch_alter_table('page_tags', schema=None) as batch_op:
+        batch_op.drop_index('ix_page_tags_tag_id_page_id')
+
+    with op.batch_alter_table('page', schema=None) as batch_op:
+        batch_op.drop_index('ix_page_is_published_view_count')
+        batch_op.drop_index('ix_page_is_published_created_at')
+        batch_op.drop_index('ix_page_is_published_published_at')
+        batch_op.create_index('ix_page_is_published', ['is_published'], unique=False)
@@ -2,7 +2,7 @@
 Base test class for the application.
 """
 import unittest
-from flask import url_for
+from flask import g, url_for
 from flask_login import login_user, current_user
 from app import create_app, db
 from app.models import User, Page, Tag
@@ -14,6 +14,8 @@ class TestConfig(Config):
     """Test configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite://'  # Use in-memory database for testing
+    QUERY_BUDGET = 50
+    QUERY_BUDGET_ACTION = 'raise'  # Fail tests of views running too many queries
     WTF_CSRF_ENABLED = False  # Disable CSRF protection for testing
     SECRET_KEY = 'test-secret-key'
 
@@ -59,6 +61,8 @@ class BaseTestCase(unittest.TestCase):
 
     def login(self, email='test@example.com', password='password'):
         """Log in a user for testing"""
+        # Requests share the test app context, so forget the user loaded by earlier ones
+        g.pop('_login_user', None)
         with self.client.session_transaction() as sess:
             # Get the user
             user = User.query.filter_by(email=email).first()
@@ -71,6 +75,7 @@ class BaseTestCase(unittest.TestCase):
 
     def logout(self):
         """Log out a user for testing"""
+        g.pop('_login_user', None)
         with self.client.session_transaction() as sess:
             if '_user_id' in sess:
                 del sess['_user_id']
@@ -1,10 +1,21 @@
 import unittest
 import json
 import base64
+from unittest.mock import patch
+from flask.sessions import TaggedJSONSerializer
+from sqlalchemy import event
 from app.models import User, Page, Tag
 from datetime import datetime, timezone
 from tests.base import BaseTestCase
-from app import db
+from app import db, cache
+from app.api import resolve_tags, write_in_batches
+from app.cache_stats import reset_cache_stats
+from app.cache_warm import warm_cache
+from app.json_provider import (JSON_PROVIDERS, ORJSON_AVAILABLE, OrjsonProvider,
+                               StdlibJSONProvider, init_json_provider)
+from app.utils.db_utils import QueryCounter
+from app.utils.pagination_utils import encode_cursor
+from app.view_counts import _pending, flush_view_counts
 
 class APITestCase(BaseTestCase):
     """Test case for API endpoints"""
@@ -62,6 +73,37 @@ class APITestCase(BaseTestCase):
         data = json.loads(response.data)
         self.assertIn('token', data)
 
+    def test_token_cache_skips_user_query(self):
+        """Test that a verified token is not decoded and looked up again"""
+        headers = {'Authorization': f'Bearer {self.get_token()}'}
+        self.client.get(f'/api/users/{self.user.id}', headers=headers)
+
+        with patch('app.api.jwt.decode') as decode, patch('app.api.db.session.get') as get:
+            response = self.client.get(f'/api/users/{self.user.id}', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        decode.assert_not_called()
+        get.assert_not_called()
+
+    def test_token_cache_invalidated_on_update(self):
+        """Test that updating a user drops its cached tokens"""
+        headers = {'Authorization': f"Bearer {self.get_token('admin@example.com', 'adminpassword')}"}
+        user_headers = {'Authorization': f'Bearer {self.get_token()}'}
+        self.assertEqual(self.client.get('/api/users', headers=user_headers).status_code, 200)
+
+        response = self.client.put(f'/api/users/{self.user.id}', headers=headers, json={'role': 'user'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/users', headers=user_headers).status_code, 403)
+
+        response = self.client.post('/api/users', json={
+            'username': 'doomed', 'email': 'doomed@example.com', 'password': 'doomedpassword'})
+        doomed_id = json.loads(response.data)['user']['id']
+        doomed_headers = {'Authorization': f"Bearer {self.get_token('doomed@example.com', 'doomedpassword')}"}
+        self.assertEqual(self.client.get(f'/api/users/{doomed_id}', headers=doomed_headers).status_code, 200)
+
+        response = self.client.delete(f'/api/users/{doomed_id}', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(f'/api/users/{doomed_id}', headers=doomed_headers).status_code, 401)
+
     def test_get_pages(self):
         """Test getting all pages"""
         response = self.client.get('/api/pages')
@@ -71,6 +113,123 @@ class APITestCase(BaseTestCase):
         self.assertEqual(len(data['pages']), 1)
         self.assertEqual(data['pages'][0]['title'], 'Test Page')
 
+    def test_get_pages_cursor_pagination(self):
+        """Test paging through pages with limit and after"""
+        for i in range(4):
+            page = Page(
+                title=f'Extra Page {i}',
+                slug=f'extra-page-{i}',
+                content='Extra content',
+                is_published=True,
+                user_id=self.user.id,
+                published_at=datetime(2024, 1, 1, tzinfo=timezone.utc)
+            )
+            db.session.add(page)
+        db.session.add(Page(title='Undated Page', slug='undated-page', content='Undated',
+                            is_published=True, user_id=self.user.id))
+        db.session.commit()
+
+        seen = []
+        url = '/api/pages?limit=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.data)
+            self.assertLessEqual(len(data['pages']), 2)
+            seen.extend(page['slug'] for page in data['pages'])
+            url = f"/api/pages?limit=2&after={data['next']}" if data['next'] else None
+
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+        self.assertEqual(seen[0], 'test-page')
+        self.assertEqual(seen[-1], 'undated-page')
+
+    def test_get_pages_cursor_seeks_index(self):
+        """Test that a cursor is served by a range seek on the listing index"""
+        cursor = encode_cursor(datetime(2024, 1, 1), 5)
+        statements = []
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if 'FROM page' in statement and 'published_at' in statement:
+                statements.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            self.assertEqual(self.client.get(f'/api/pages?after={cursor}').status_code, 200)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        with db.engine.connect() as connection:
+            plans = [row[3] for statement, parameters in statements for row in
+                     connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+        # The joined author is looked up by primary key; the dated and the undated pages are seeked
+        plans = [plan for plan in plans if 'user' not in plan]
+        self.assertEqual(len(plans), 2)
+        for plan in plans:
+            self.assertIn('USING INDEX ix_page_is_published_published_at', plan)
+            # A seek on published_at, not only on is_published
+            self.assertRegex(plan, r'published_at[<=>]')
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_get_pages_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        response = self.client.get('/api/pages?after=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_users_cursor_pagination(self):
+        """Test paging through users with limit and after"""
+        headers = {'Authorization': f'Bearer {self.get_token()}'}
+        response = self.client.get('/api/users?limit=1', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual([user['username'] for user in data['users']], ['testuser'])
+        self.assertIsNotNone(data['next'])
+
+        response = self.client.get(f"/api/users?limit=1&after={data['next']}", headers=headers)
+        data = json.loads(response.data)
+        self.assertEqual([user['username'] for user in data['users']], ['admin'])
+        self.assertIsNone(data['next'])
+
+    def test_get_pages_sparse_fields(self):
+        """Test selecting fields and the summary view on the pages list"""
+        response = self.client.get('/api/pages?fields=title,tags')
+        self.assertEqual(response.status_code, 200)
+        page = json.loads(response.data)['pages'][0]
+        self.assertEqual(set(page), {'id', 'title', 'tags'})
+        self.assertEqual(page['tags'], ['TestTag'])
+
+        response = self.client.get('/api/pages?view=summary')
+        page = json.loads(response.data)['pages'][0]
+        self.assertNotIn('content', page)
+        self.assertEqual(page['author'], 'testuser')
+
+    def test_get_pages_unknown_field(self):
+        """Test that unknown fields are rejected"""
+        response = self.client.get('/api/pages?fields=title,password_hash')
+        self.assertEqual(response.status_code, 400)
+
+    def test_page_lists_run_constant_queries(self):
+        """Test that serializing page lists does not run queries per page"""
+        def count_queries(url):
+            cache.clear()
+            with QueryCounter() as counter:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return counter.count
+
+        urls = ['/api/pages', f'/api/tags/{self.tag.id}']
+        baseline = {url: count_queries(url) for url in urls}
+
+        for i in range(10):
+            author = self.user if i % 2 else self.admin
+            page = Page(title=f'Page {i}', slug=f'page-{i}', content='Body', is_published=True,
+                        user_id=author.id, published_at=datetime.now(timezone.utc))
+            page.tags.append(self.tag)
+            db.session.add(page)
+        db.session.commit()
+
+        for url in urls:
+            self.assertEqual(count_queries(url), baseline[url], url)
+
     def test_get_page(self):
         """Test getting a specific page"""
         response = self.client.get(f'/api/pages/{self.page.id}')
@@ -79,6 +238,79 @@ class APITestCase(BaseTestCase):
         self.assertIn('page', data)
         self.assertEqual(data['page']['title'], 'Test Page')
 
+    def test_get_page_conditional(self):
+        """Test ETag and Last-Modified handling on a single page"""
+        response = self.client.get(f'/api/pages/{self.page.id}')
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+        last_modified = response.headers['Last-Modified']
+
+        response = self.client.get(f'/api/pages/{self.page.id}', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+        response = self.client.get(f'/api/pages/{self.page.id}',
+                                   headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 304)
+
+        # Changing the page invalidates the ETag and the cached body
+        self.page.title = 'Changed Title'
+        self.page.updated_at = datetime(2030, 1, 1, tzinfo=timezone.utc)
+        db.session.commit()
+        response = self.client.get(f'/api/pages/{self.page.id}', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['page']['title'], 'Changed Title')
+
+    def test_page_etag_follows_tag_and_author_renames(self):
+        """Test that renaming the tags or author of a page changes its ETag"""
+        url = f'/api/pages/{self.page.id}'
+        for rename in (lambda: setattr(self.tag, 'name', 'RenamedTag'),
+                       lambda: setattr(self.user, 'username', 'renamed')):
+            etag = self.client.get(url).headers['ETag']
+            rename()
+            db.session.commit()
+            response = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_get_pages_conditional(self):
+        """Test collection ETags on the pages and tags lists"""
+        for url in ('/api/pages', '/api/tags'):
+            response = self.client.get(url)
+            etag = response.headers['ETag']
+            response = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+
+        # A different representation gets a different ETag
+        response = self.client.get('/api/pages?view=summary', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_collection_etags_follow_relinks_and_renames(self):
+        """Test that retagging and renames change the collection ETags and 304s run no queries"""
+        def etag(url):
+            self.client.get(url)
+            return self.client.get(url).headers['ETag']
+
+        pages_etag, tags_etag = etag('/api/pages'), etag('/api/tags')
+        with QueryCounter() as counter:
+            response = self.client.get('/api/pages', headers={'If-None-Match': pages_etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(counter.count, 0)
+
+        other = Tag(name='Other')
+        self.page.tags.append(other)
+        db.session.commit()
+        self.assertNotEqual(etag('/api/pages'), pages_etag)
+        self.assertNotEqual(etag('/api/tags'), tags_etag)
+
+        for rename in (lambda: setattr(other, 'name', 'Renamed'),
+                       lambda: setattr(self.user, 'username', 'renamed')):
+            pages_etag = etag('/api/pages')
+            rename()
+            db.session.commit()
+            response = self.client.get('/api/pages', headers={'If-None-Match': pages_etag})
+            self.assertEqual(response.status_code, 200)
+
     def test_get_tags(self):
         """Test getting all tags"""
         response = self.client.get('/api/tags')
@@ -88,6 +320,284 @@ class APITestCase(BaseTestCase):
         self.assertEqual(len(data['tags']), 1)
         self.assertEqual(data['tags'][0]['name'], 'TestTag')
 
+    def test_db_pool_stats(self):
+        """Test the connection pool stats endpoint"""
+        self.user.role = 'user'
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {self.get_token()}'}
+        self.assertEqual(self.client.get('/api/stats/db-pool', headers=headers).status_code, 403)
+
+        headers = {'Authorization': f"Bearer {self.get_token('admin@example.com', 'adminpassword')}"}
+        response = self.client.get('/api/stats/db-pool', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        stats = json.loads(response.data)['engines']['default']
+        self.assertGreater(stats['checkouts'], 0)
+        self.assertGreaterEqual(stats['max_checked_out'], 1)
+
+    def test_tag_catalog(self):
+        """Test the tag picker catalog, its revalidation and invalidation"""
+        db.session.add(Tag(name='Alpha'))
+        db.session.commit()
+
+        response = self.client.get('/api/tags/catalog')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual([name for _, name in data['tags']], ['Alpha', 'TestTag'])
+        self.assertEqual(json.loads(self.client.get('/api/tags/catalog?q=test').data)['tags'],
+                         [[self.tag.id, 'TestTag']])
+
+        # The page form reuses the catalog without querying tags
+        self.login()
+        self.client.get('/content/page/new')
+        with QueryCounter() as counter:
+            self.assertEqual(self.client.get('/content/page/new').status_code, 200)
+        self.assertFalse([statement for statement in counter.statements if 'FROM tag' in statement])
+
+        etag = response.headers['ETag']
+        self.assertEqual(self.client.get('/api/tags/catalog', headers={'If-None-Match': etag}).status_code, 304)
+
+        self.tag.name = 'Renamed'
+        db.session.commit()
+        response = self.client.get('/api/tags/catalog', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([name for _, name in json.loads(response.data)['tags']], ['Alpha', 'Renamed'])
+
+    def test_view_counts_and_popular_pages(self):
+        """Test buffered page view counting and the popular pages listing"""
+        _pending.clear()
+        other = Page(title='Other Page', slug='other-page', content='Other', is_published=True, user_id=1,
+                     published_at=datetime.now(timezone.utc))
+        db.session.add(other)
+        db.session.commit()
+        updated_at = self.page.updated_at
+
+        self.app.config['VIEW_COUNT_FLUSH_INTERVAL'] = 3600
+        for _ in range(3):
+            self.assertEqual(self.client.get('/content/page/test-page').status_code, 200)
+        self.client.get('/content/page/other-page')
+        self.client.get('/content/page/missing')
+
+        # Views are buffered, including those served from the cache
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Page, self.page.id).view_count, 0)
+        self.assertEqual(flush_view_counts(), 4)
+        self.assertEqual(flush_view_counts(), 0)
+
+        db.session.expire_all()
+        page = db.session.get(Page, self.page.id)
+        self.assertEqual(page.view_count, 3)
+        self.assertEqual(page.updated_at, updated_at)
+        self.assertEqual(db.session.get(Page, other.id).view_count, 1)
+
+        response = self.client.get('/api/pages/popular?fields=slug')
+        self.assertEqual(response.status_code, 200)
+        pages = json.loads(response.data)['pages']
+        self.assertEqual([(page['slug'], page['views']) for page in pages],
+                         [('test-page', 3), ('other-page', 1)])
+
+        # Reaching the pending limit writes the views early, outside the request's query count
+        self.app.config['VIEW_COUNT_MAX_PENDING'] = 2
+        first = self.client.get('/content/page/other-page')
+        second = self.client.get('/content/page/other-page')
+        self.assertEqual(second.headers['X-DB-Queries'], first.headers['X-DB-Queries'])
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Page, other.id).view_count, 3)
+
+    def test_cache_warm_not_counted_as_views(self):
+        """Test that warming the page views leaves the view counts alone"""
+        _pending.clear()
+        self.app.config['VIEW_COUNT_FLUSH_INTERVAL'] = 3600
+        results = warm_cache(['/content/page/test-page'], workers=1)
+        self.assertEqual(results[0][1], 200)
+        self.assertEqual(flush_view_counts(), 0)
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Page, self.page.id).view_count, 0)
+
+    def test_export_pages_ndjson(self):
+        """Test streaming the pages table as NDJSON"""
+        headers = {'Authorization': f'Bearer {self.get_token()}'}
+        response = self.client.get('/api/export/pages?view=summary', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual(row['slug'], 'test-page')
+        self.assertEqual(row['tags'], ['TestTag'])
+        self.assertNotIn('content', row)
+
+    def test_export_users_csv(self):
+        """Test streaming the users table as CSV"""
+        headers = {'Authorization': f'Bearer {self.get_token()}'}
+        response = self.client.get('/api/export/users?format=csv&fields=username,roles', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/csv')
+
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(lines[0], 'id,username,roles')
+        self.assertEqual(len(lines), 3)
+
+    def test_export_validation(self):
+        """Test export permission and parameter checks"""
+        self.user.role = 'user'
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {self.get_token()}'}
+        self.assertEqual(self.client.get('/api/export/pages', headers=headers).status_code, 403)
+
+        headers = {'Authorization': f"Bearer {self.get_token('admin@example.com', 'adminpassword')}"}
+        self.assertEqual(self.client.get('/api/export/tags', headers=headers).status_code, 404)
+        self.assertEqual(self.client.get('/api/export/pages?format=xml', headers=headers).status_code, 400)
+
+    def test_cache_stats(self):
+        """Test the cache stats endpoint and CLI command"""
+        reset_cache_stats()
+        self.client.get('/api/tags')
+        self.client.get('/api/tags')
+
+        self.user.role = 'user'
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {self.get_token()}'}
+        self.assertEqual(self.client.get('/api/stats/cache', headers=headers).status_code, 403)
+
+        headers = {'Authorization': f"Bearer {self.get_token('admin@example.com', 'adminpassword')}"}
+        response = self.client.get('/api/stats/cache', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        stats = json.loads(response.data)
+        self.assertIn('content.pages', stats)
+        tags = stats['api.get_tags']
+        self.assertEqual((tags['hits'], tags['misses'], tags['rebuilds'], tags['stores']), (1, 1, 1, 1))
+        self.assertEqual(tags['hit_ratio'], 0.5)
+        self.assertGreater(tags['avg_entry_bytes'], 0)
+        self.assertEqual(tags['timeout'], 86400)
+
+        result = self.app.test_cli_runner().invoke(args=['cache-stats', '--json', '--reset'])
+        self.assertEqual(json.loads(result.output.split('Cache stats reset.')[0])['api.get_tags']['hits'], 1)
+        result = self.app.test_cli_runner().invoke(args=['cache-stats'])
+        self.assertRegex(result.output, r'api\.get_tags\s+86400\s+0\s+0')
+
+    def test_draft_page_cache_varies_on_audience(self):
+        """Test that a cached draft is only served to its author and admins"""
+        self.user.role = 'user'
+        reader = User(username='reader', email='reader@example.com', role='user')
+        reader.set_password('password')
+        draft = Page(title='Draft', slug='draft', content='Draft', user_id=self.user.id, is_published=False)
+        db.session.add_all([reader, draft])
+        db.session.commit()
+        url = f'/api/pages/{draft.id}'
+
+        self.login()
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.login('reader@example.com', 'password')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.logout()
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.login('admin@example.com', 'adminpassword')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_bulk_create_pages(self):
+        """Test creating pages in bulk with per-item errors"""
+        # Warm the cached tag page to check that links written in bulk invalidate it
+        self.login()
+        response = self.client.get('/content/tag/TestTag')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'Bulk One', response.data)
+
+        headers = {'Authorization': f'Bearer {self.get_token()}'}
+        response = self.client.post('/api/pages/bulk', headers=headers, json={'pages': [
+            {'title': 'Bulk One', 'content': 'One', 'tags': ['TestTag', 'Bulk'], 'is_published': True},
+            {'title': 'Bulk Two', 'content': 'Two', 'tags': ['Bulk', 'Bulk']},
+            {'title': 'No content'},
+            {'title': 'Duplicate', 'slug': 'test-page', 'content': 'Taken slug'},
+            {'title': 'Bulk One', 'content': 'Same slug as the first item'}
+        ]})
+        self.assertEqual(response.status_code, 207)
+        results = json.loads(response.data)['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['created', 'created', 'error', 'error', 'error'])
+
+        page = db.session.get(Page, results[0]['id'])
+        self.assertEqual(page.slug, 'bulk-one')
+        self.assertIsNotNone(page.published_at)
+        self.assertEqual(sorted(tag.name for tag in page.tags), ['Bulk', 'TestTag'])
+        self.assertEqual(Tag.query.filter_by(name='Bulk').count(), 1)
+        self.assertIn(b'Bulk One', self.client.get('/content/tag/TestTag').data)
+
+    def test_bulk_items_validated(self):
+        """Test that malformed bulk items are reported per item instead of failing the request"""
+        headers = {'Authorization': f'Bearer {self.get_token()}'}
+        response = self.client.post('/api/pages/bulk', headers=headers, json=[
+            {'title': 5, 'content': 'Number title'},
+            {'title': 'List slug', 'content': 'x', 'slug': ['a']},
+            {'title': 'Dict tag', 'content': 'x', 'tags': [{'name': 'a'}]},
+            {'title': 'String flag', 'content': 'x', 'is_published': 'yes'},
+            {'title': 'Valid', 'content': 'x', 'tags': ['Valid']}
+        ])
+        self.assertEqual(response.status_code, 207)
+        results = json.loads(response.data)['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['error', 'error', 'error', 'error', 'created'])
+        self.assertIn('title', results[0]['message'])
+
+        response = self.client.patch('/api/pages/bulk', headers=headers, json=[
+            {'id': self.page.id, 'is_published': 1},
+            {'id': self.page.id, 'tags': 'TestTag'},
+            {'id': self.page.id, 'content': None}
+        ])
+        self.assertEqual([result['status'] for result in json.loads(response.data)['results']],
+                         ['error', 'error', 'error'])
+
+    def test_write_errors_reported_per_item(self):
+        """Test that any database error of an item is reported without losing earlier batches"""
+        self.app.config['BULK_BATCH_SIZE'] = 1
+
+        def write(batch):
+            index, value = batch[0]
+            db.session.add(Page(title='Batch', slug=f'batch-{index}', content='x', user_id=1,
+                                is_published=value))
+            db.session.flush()
+            return [(index, None)]
+
+        with self.app.test_request_context():
+            results = write_in_batches([(0, True), (1, 'not a boolean')], write)
+        self.assertEqual([error is None for _, _, error in results], [True, False])
+        self.assertIsNotNone(Page.query.filter_by(slug='batch-0').first())
+
+    def test_resolve_tags_after_concurrent_insert(self):
+        """Test that tags created by a concurrent request are looked up again"""
+        with self.app.test_request_context(), \
+                patch('app.api.find_tags', side_effect=[{}, {'TestTag': self.tag}]):
+            tags = resolve_tags(['TestTag'])
+        self.assertEqual(tags['TestTag'].id, self.tag.id)
+        self.assertEqual(Tag.query.filter_by(name='TestTag').count(), 1)
+
+    def test_bulk_update_pages(self):
+        """Test updating pages in bulk with per-item errors"""
+        other = Page(title='Other Page', slug='other-page', content='Other', user_id=self.admin.id)
+        db.session.add(other)
+        db.session.commit()
+
+        self.user.role = 'user'
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {self.get_token()}'}
+        response = self.client.patch('/api/pages/bulk', headers=headers, json=[
+            {'id': self.page.id, 'title': 'Bulk Updated', 'tags': ['Fresh']},
+            {'id': other.id, 'title': 'Not mine'},
+            {'id': 9999, 'title': 'Missing'}
+        ])
+        self.assertEqual(response.status_code, 207)
+        results = json.loads(response.data)['results']
+        self.assertEqual([result['status'] for result in results], ['updated', 'error', 'error'])
+
+        db.session.expire_all()
+        page = db.session.get(Page, self.page.id)
+        self.assertEqual(page.title, 'Bulk Updated')
+        self.assertEqual([tag.name for tag in page.tags], ['Fresh'])
+        self.assertEqual(db.session.get(Page, other.id).title, 'Other Page')
+
     def test_create_user(self):
         """Test creating a new user"""
         response = self.client.post(
@@ -108,5 +618,50 @@ class APITestCase(BaseTestCase):
         self.assertIsNotNone(user)
         self.assertEqual(user.username, 'newuser')
 
+class JSONProviderTestCase(BaseTestCase):
+    """Test case for the pluggable JSON providers"""
+
+    def test_providers_produce_same_document(self):
+        """Test that both providers serialize dates and keys the same way"""
+        data = {'b': datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc), 'a': [1, 'x', None]}
+        documents = [provider(self.app).dumps(data) for provider in JSON_PROVIDERS.values()]
+        for document in documents:
+            self.assertEqual(json.loads(document), {'a': [1, 'x', None], 'b': '2024-05-01T12:30:00+00:00'})
+            self.assertLess(document.index('"a"'), document.index('"b"'))
+
+    def test_provider_selection(self):
+        """Test selecting the provider from the configuration"""
+        self.app.config['JSON_PROVIDER'] = 'stdlib'
+        init_json_provider(self.app)
+        self.assertIsInstance(self.app.json, StdlibJSONProvider)
+
+        self.app.config['JSON_PROVIDER'] = 'auto'
+        init_json_provider(self.app)
+        expected = OrjsonProvider if ORJSON_AVAILABLE else StdlibJSONProvider
+        self.assertIsInstance(self.app.json, expected)
+
+        self.app.config['JSON_PROVIDER'] = 'yaml'
+        with self.assertRaises(ValueError):
+            init_json_provider(self.app)
+
+    @unittest.skipUnless(ORJSON_AVAILABLE, 'orjson is not installed')
+    def test_orjson_response(self):
+        """Test API responses served through orjson"""
+        self.app.config['JSON_PROVIDER'] = 'orjson'
+        init_json_provider(self.app)
+        response = self.client.get('/api/tags')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content_type, 'application/json')
+        self.assertEqual(json.loads(response.data)['tags'][0]['name'], 'TestTag')
+
+    @unittest.skipUnless(ORJSON_AVAILABLE, 'orjson is not installed')
+    def test_orjson_session_round_trip(self):
+        """Test that tagged session values such as flashed messages survive the orjson provider"""
+        self.app.config['JSON_PROVIDER'] = 'orjson'
+        init_json_provider(self.app)
+        serializer = TaggedJSONSerializer()
+        value = {'_flashes': [('danger', 'Invalid email or password')]}
+        self.assertEqual(serializer.loads(serializer.dumps(value)), value)
+
 if __name__ == '__main__':
     unittest.main()
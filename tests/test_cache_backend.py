@@ -0,0 +1,231 @@
+import queue
+import time
+import unittest
+from time import monotonic
+from flask import Flask
+from flask_caching import Cache
+from app.cache_backend import LocalCache, TwoTierRedisCache
+
+class FakeRedis:
+    """In-memory stand-in for the parts of redis-py used by the cache"""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.subscribers = {}
+        self.calls = 0
+
+    def _live(self, name):
+        if name in self.expires and self.expires[name] <= monotonic():
+            self.data.pop(name, None)
+            self.expires.pop(name, None)
+        return name in self.data
+
+    def get(self, name):
+        self.calls += 1
+        return self.data.get(name) if self._live(name) else None
+
+    def mget(self, names):
+        self.calls += 1
+        return [self.data.get(name) if self._live(name) else None for name in names]
+
+    def set(self, name, value):
+        self.data[name] = value
+        self.expires.pop(name, None)
+        return True
+
+    def setex(self, name, value, time):
+        self.set(name, value)
+        self.expires[name] = monotonic() + time
+        return True
+
+    def setnx(self, name, value):
+        if self._live(name):
+            return False
+        return self.set(name, value)
+
+    def expire(self, name, time):
+        self.expires[name] = monotonic() + time
+
+    def exists(self, name):
+        return int(self._live(name))
+
+    def delete(self, *names):
+        return sum(self.data.pop(name, None) is not None for name in names)
+
+    def incr(self, name, amount=1):
+        value = int(self.data.get(name, b'0')) + amount if self._live(name) else amount
+        self.data[name] = str(value).encode()
+        return value
+
+    def keys(self, pattern):
+        return [name for name in list(self.data) if name.startswith(pattern.rstrip('*')) and self._live(name)]
+
+    def flushdb(self):
+        self.data.clear()
+        self.expires.clear()
+        return True
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def publish(self, channel, message):
+        for subscriber in self.subscribers.get(channel, []):
+            subscriber.put({'type': 'message', 'channel': channel, 'data': message})
+        return len(self.subscribers.get(channel, []))
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+class FakePipeline:
+    """Pipeline running the queued commands on execute()"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda **kwargs: self.commands.append((getattr(self.redis, name), kwargs))
+
+    def execute(self):
+        return [command(**kwargs) for command, kwargs in self.commands]
+
+class FakePubSub:
+    """Subscription delivering published messages through a queue"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.messages = queue.Queue()
+
+    def subscribe(self, channel):
+        self.redis.subscribers.setdefault(channel, []).append(self.messages)
+
+    def listen(self):
+        while True:
+            yield self.messages.get()
+
+class LocalCacheTestCase(unittest.TestCase):
+    """Test case for the per-process LRU"""
+
+    def test_bounded_by_entries_and_bytes(self):
+        """Test that the least recently used entries are evicted"""
+        local = LocalCache(max_entries=2, max_bytes=100, ttl=60)
+        local.set('a', 1, 10)
+        local.set('b', 2, 10)
+        local.get('a')
+        local.set('c', 3, 10)
+        self.assertEqual(local.get('b'), (False, None))
+        self.assertEqual(local.get('a'), (True, 1))
+
+        local.set('d', 4, 95)
+        self.assertEqual(len(local), 1)
+        self.assertEqual(local.size, 95)
+
+        # Values larger than the whole tier are not kept
+        local.set('e', 5, 101)
+        self.assertEqual(local.get('e'), (False, None))
+
+    def test_ttl(self):
+        """Test that entries expire after the local TTL"""
+        local = LocalCache(ttl=0.01)
+        local.set('a', 1, 1)
+        time.sleep(0.02)
+        self.assertEqual(local.get('a'), (False, None))
+
+class TwoTierRedisCacheTestCase(unittest.TestCase):
+    """Test case for the two-tier cache backend"""
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.worker = TwoTierRedisCache(host=self.redis, key_prefix='test:', local_ttl=60)
+        self.peer = TwoTierRedisCache(host=self.redis, key_prefix='test:', local_ttl=60)
+
+        # Start both subscribers before publishing anything
+        self.worker.get('warmup')
+        self.peer.get('warmup')
+        self.wait_for(lambda: len(self.redis.subscribers.get('test:cache-invalidate', [])) == 2)
+
+    def wait_for(self, condition):
+        """Wait until the subscriber threads have applied the published messages"""
+        deadline = time.monotonic() + 2
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_hits_served_locally(self):
+        """Test that repeated gets do not reach Redis"""
+        self.worker.set('index', {'body': b'home'})
+        self.assertEqual(self.peer.get('index'), {'body': b'home'})
+        calls = self.redis.calls
+        for _ in range(10):
+            self.assertEqual(self.peer.get('index'), {'body': b'home'})
+            self.assertEqual(self.peer.get_many('index'), [{'body': b'home'}])
+        self.assertEqual(self.redis.calls, calls)
+
+    def test_peers_invalidated(self):
+        """Test that writes and deletes reach the local tier of other processes"""
+        self.worker.set('index', 'old')
+        self.assertEqual(self.peer.get('index'), 'old')
+
+        self.worker.set('index', 'new')
+        self.wait_for(lambda: self.peer.get('index') == 'new')
+
+        self.worker.delete('index')
+        self.wait_for(lambda: self.peer.get('index') is None)
+
+        self.peer.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.worker.get_many('a', 'b'), [1, 2])
+        self.peer.clear()
+        self.wait_for(lambda: self.worker.get_many('a', 'b') == [None, None])
+
+    def test_shared_operations_bypass_local_tier(self):
+        """Test that locks and counters use the shared state"""
+        self.assertTrue(self.worker.add('lock', 1, timeout=30))
+        self.assertFalse(self.peer.add('lock', 1, timeout=30))
+        self.assertTrue(self.peer.has('lock'))
+        self.worker.delete('lock')
+        self.assertFalse(self.peer.has('lock'))
+
+        self.assertEqual(self.worker.inc('counter'), 1)
+        self.assertEqual(self.peer.inc('counter'), 2)
+        self.wait_for(lambda: self.worker.get('counter') == 2)
+
+    def test_excluded_keys_not_published(self):
+        """Test that counters kept only in Redis are read fresh and publish no invalidations"""
+        self.worker.local_exclude = self.peer.local_exclude = ('ratelimit/', 'lock/')
+        published = []
+        publish = self.redis.publish
+
+        def record(channel, message):
+            published.append(message)
+            return publish(channel, message)
+        self.redis.publish = record
+
+        self.assertTrue(self.worker.add('lock/index', 1, timeout=30))
+        self.assertEqual(self.worker.inc('ratelimit/client/1'), 1)
+        self.assertEqual(self.peer.get('ratelimit/client/1'), 1)
+        self.assertEqual(self.peer.inc('ratelimit/client/1'), 2)
+        self.assertEqual(self.peer.get('ratelimit/client/1'), 2)
+        self.assertEqual(self.worker.get_many('ratelimit/client/1'), [2])
+        self.assertEqual(published, [])
+
+        self.worker.set('index', 'home')
+        self.assertEqual(len(published), 1)
+
+    def test_flask_caching_factory(self):
+        """Test selecting the backend with CACHE_TYPE"""
+        app = Flask(__name__)
+        cache = Cache(app, config={
+            'CACHE_TYPE': 'app.cache_backend.TwoTierRedisCache',
+            'CACHE_REDIS_HOST': self.redis,
+            'CACHE_KEY_PREFIX': 'test:',
+            'CACHE_LOCAL_MAX_ENTRIES': 10
+        })
+        with app.app_context():
+            self.assertIsInstance(cache.cache, TwoTierRedisCache)
+            self.assertEqual(cache.cache.local.max_entries, 10)
+            cache.set('key', 'value')
+            self.assertEqual(self.peer.get('key'), 'value')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,11 @@
 import unittest
-from app.models import User, Page, Tag
+from unittest.mock import patch
+from datetime import datetime, timezone
+from app import db, cache, compression
+from sqlalchemy import event
+from app.models import User, Page, Tag, PageVersion
+from app.utils.db_utils import QueryCounter
+from app.caching import namespace_versions, wait_for_refreshes
 from tests.base import BaseTestCase
 
 class ContentTestCase(BaseTestCase):
@@ -104,5 +110,206 @@ class ContentTestCase(BaseTestCase):
         response = self.client.get('/content/tags')
         self.assertIn(b'NewTag', response.data)
 
+    def test_listings_run_constant_queries(self):
+        """Test that page listings do not run queries per page"""
+        def add_pages(count, offset):
+            for i in range(offset, offset + count):
+                page = Page(title=f'Listed Page {i}', slug=f'listed-page-{i}', content='Listed',
+                            user_id=self.user.id, is_published=True,
+                            published_at=datetime.now(timezone.utc))
+                page.tags.append(self.tag)
+                db.session.add(page)
+            db.session.commit()
+
+        def count_queries(url):
+            cache.clear()
+            with QueryCounter() as counter:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return counter.count
+
+        urls = ['/content/pages', f'/content/tag/{self.tag.name}', '/sitemap', '/']
+        add_pages(1, 0)
+        baseline = {url: count_queries(url) for url in urls}
+        add_pages(10, 1)
+        for url in urls:
+            self.assertEqual(count_queries(url), baseline[url], url)
+
+    def test_listings_use_indexes(self):
+        """Test that listing queries read an index in order instead of scanning and sorting"""
+        page = Page(title='Indexed Page', slug='indexed-page', content='Content', is_published=True,
+                    user_id=self.user.id, published_at=datetime.now(timezone.utc))
+        page.tags.append(self.tag)
+        db.session.add_all([page, PageVersion(page=page, title=page.title, content=page.content,
+                                              user_id=self.user.id)])
+        db.session.commit()
+
+        statements = []
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('SELECT'):
+                statements.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            for url in ('/index', '/content/pages', '/content/tag/TestTag', '/content/page/indexed-page/versions',
+                        '/content/media', '/api/pages', '/api/pages/popular'):
+                self.assertEqual(self.client.get(url).status_code, 200, url)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        with db.engine.connect() as connection:
+            for statement, parameters in statements:
+                plan = [row[3] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+                for step in plan:
+                    self.assertNotIn('TEMP B-TREE', step, statement)
+                    self.assertFalse(step.startswith('SCAN'), f'{step}: {statement}')
+
+    def test_cached_views_invalidated_on_commit(self):
+        """Test that committed page changes are visible in cached views"""
+        page = Page(title='Cached Title', slug='cached-page', content='Cached', user_id=self.user.id,
+                    is_published=True, published_at=datetime.now(timezone.utc))
+        page.tags.append(self.tag)
+        db.session.add(page)
+        db.session.commit()
+
+        urls = ['/content/pages', f'/content/tag/{self.tag.name}', '/sitemap', '/']
+        for url in urls:
+            self.assertIn(b'Cached Title', self.client.get(url).data)
+
+        page.title = 'Fresh Title'
+        db.session.commit()
+
+        # Listings refresh in the background and may serve the outdated entry once
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        wait_for_refreshes()
+        for url in urls:
+            response = self.client.get(url)
+            self.assertIn(b'Fresh Title', response.data, url)
+            self.assertNotIn(b'Cached Title', response.data, url)
+
+    def test_invalidation_is_limited_to_affected_namespaces(self):
+        """Test that only the namespaces touched by a change are bumped"""
+        other = Tag(name='OtherTag')
+        page = Page(title='Tagged', slug='tagged', content='Tagged', user_id=self.user.id, is_published=True)
+        page.tags.append(self.tag)
+        db.session.add_all([other, page])
+        db.session.commit()
+
+        names = ['pages', 'tags', 'page:tagged', f'tag:{self.tag.name}', 'tag:OtherTag']
+        before = dict(zip(names, namespace_versions(names)))
+
+        # Moving the page to another tag changes both tags but not the tag list
+        page.tags = [other]
+        db.session.commit()
+        after = dict(zip(names, namespace_versions(names)))
+        self.assertEqual(after['tags'], before['tags'])
+        for name in ('pages', 'page:tagged', f'tag:{self.tag.name}', 'tag:OtherTag'):
+            self.assertNotEqual(after[name], before[name], name)
+
+        # Rolled back changes do not invalidate anything
+        page.title = 'Discarded'
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual(dict(zip(names, namespace_versions(names))), after)
+
+    def test_author_rename_invalidates_their_pages(self):
+        """Test that renaming a user bumps the namespaces of the pages they wrote"""
+        other = User(username='other', email='other@example.com')
+        other.set_password('password')
+        db.session.add(other)
+        db.session.flush()
+        db.session.add_all([
+            Page(title='Mine', slug='mine', content='Mine', user_id=self.user.id),
+            Page(title='Theirs', slug='theirs', content='Theirs', user_id=other.id)])
+        db.session.commit()
+        mine = Page.query.filter_by(slug='mine').one()
+        theirs = Page.query.filter_by(slug='theirs').one()
+
+        names = ['pages', 'page:mine', f'page-id:{mine.id}', 'page:theirs', f'page-id:{theirs.id}']
+        before = dict(zip(names, namespace_versions(names)))
+
+        self.user.username = 'renamed'
+        db.session.commit()
+        after = dict(zip(names, namespace_versions(names)))
+        for name in ('pages', 'page:mine', f'page-id:{mine.id}'):
+            self.assertNotEqual(after[name], before[name], name)
+        for name in ('page:theirs', f'page-id:{theirs.id}'):
+            self.assertEqual(after[name], before[name], name)
+
+    def test_page_fragments_cached_for_logged_in_users(self):
+        """Test that logged in readers get cached fragments with live controls"""
+        page = Page(title='Fragment Page', slug='fragment-page', content='Fragment body', user_id=self.user.id,
+                    is_published=True, published_at=datetime.now(timezone.utc))
+        page.tags.append(self.tag)
+        db.session.add(page)
+        db.session.commit()
+
+        def render():
+            db.session.expire_all()
+            with QueryCounter() as counter:
+                response = self.client.get('/content/page/fragment-page')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'Fragment body', response.data)
+            self.assertIn(b'History', response.data)
+            return counter.count
+
+        # The author and tags are only loaded when the fragments are rendered
+        first = render()
+        self.assertLess(render(), first)
+
+        page.content = 'Edited body'
+        db.session.commit()
+        response = self.client.get('/content/page/fragment-page')
+        self.assertIn(b'Edited body', response.data)
+        self.assertNotIn(b'Fragment body', response.data)
+
+    def test_cached_listing_varies_on_audience(self):
+        """Test that cached renders are shared per audience without leaking personal values"""
+        reader = User(username='reader', email='reader@example.com', role='user')
+        reader.set_password('password')
+        db.session.add(reader)
+        db.session.commit()
+
+        response = self.client.get('/content/pages')
+        self.assertIn(b'testuser', response.data)
+        self.assertIn(b'Manage Tags', response.data)
+
+        self.login('reader@example.com', 'password')
+        response = self.client.get('/content/pages')
+        self.assertIn(b'reader', response.data)
+        self.assertNotIn(b'testuser', response.data)
+
+        self.logout()
+        response = self.client.get('/content/pages')
+        self.assertIn(b'Login', response.data)
+        self.assertNotIn(b'reader', response.data)
+
+        # A second reader is served the same cached variant with their own name
+        other = User(username='other', email='other@example.com', role='user')
+        other.set_password('password')
+        db.session.add(other)
+        db.session.commit()
+        self.login('other@example.com', 'password')
+        with QueryCounter() as counter:
+            response = self.client.get('/content/pages')
+        self.assertIn(b'other', response.data)
+        self.assertNotIn(b'reader', response.data)
+        self.assertFalse(any('FROM page' in statement for statement in counter.statements))
+
+    def test_personalized_bodies_not_stored_compressed(self):
+        """Test that compressed bodies are only cached before personal values are filled in"""
+        headers = {'Accept-Encoding': 'gzip'}
+        with patch('app.compression.compress', wraps=compression.compress) as compress:
+            for _ in range(2):
+                response = self.client.get('/content/pages', headers=headers)
+                self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+            self.assertEqual(compress.call_count, 2)
+
+            self.logout()
+            for _ in range(2):
+                self.client.get('/content/pages', headers=headers)
+            self.assertEqual(compress.call_count, 3)
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 from datetime import datetime, timezone
+from sqlalchemy import inspect
 from app import create_app, db
 from app.models import User, Role, Page, Tag, Media, PageVersion
 from config import Config
@@ -8,6 +9,8 @@ class TestConfig(Config):
     """Test configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite://'  # Use in-memory database for testing
+    QUERY_BUDGET = 50
+    QUERY_BUDGET_ACTION = 'raise'  # Fail tests of views running too many queries
 
 class UserModelTestCase(unittest.TestCase):
     """Test case for User model"""
@@ -72,6 +75,25 @@ class UserModelTestCase(unittest.TestCase):
         self.assertEqual(retrieved_page.title, 'Test Page')
         self.assertEqual(retrieved_page.author.username, 'author')
 
+    def test_page_content_rendered_on_save(self):
+        """Test that the rendered HTML and reading stats follow the content"""
+        user = User(username='author', email='author@example.com')
+        db.session.add(user)
+        db.session.commit()
+
+        page = Page(title='Rendered', slug='rendered', content='<h2>Intro</h2><script>x()</script>',
+                    user_id=user.id)
+        db.session.add(page)
+        db.session.commit()
+        self.assertEqual((page.content_html, page.word_count, page.reading_time),
+                         ('<h2 id="intro">Intro</h2>', 1, 1))
+
+        page.content = '<p>Two words</p>'
+        db.session.commit()
+        db.session.expire_all()
+        page = db.session.get(Page, page.id)
+        self.assertEqual((page.content_html, page.word_count), ('<p>Two words</p>', 2))
+
     def test_tag_creation(self):
         """Test tag creation"""
         tag = Tag(name='TestTag')
@@ -113,5 +135,33 @@ class UserModelTestCase(unittest.TestCase):
         # Test reverse relationship
         self.assertIn(page, tag1.pages)
 
+    def test_page_load_fields(self):
+        """Test that field projections skip unselected columns"""
+        user = User(username='author3', email='author3@example.com')
+        db.session.add(user)
+        db.session.commit()
+
+        page = Page(title='Projected Page', slug='projected-page', content='Large body', user_id=user.id)
+        db.session.add(page)
+        db.session.commit()
+        db.session.expunge_all()
+
+        fields = Page.resolve_fields(view='summary')
+        page = Page.query.options(Page.load_fields(fields)).first()
+        self.assertIn('content', inspect(page).unloaded)
+
+        data = page.to_dict(fields)
+        self.assertEqual(data['author'], 'author3')
+        self.assertNotIn('content', data)
+        self.assertIn('content', inspect(page).unloaded)
+
+    def test_resolve_fields_rejects_unknown(self):
+        """Test that unknown fields and views raise ValueError"""
+        with self.assertRaises(ValueError):
+            Page.resolve_fields(['title', 'nope'])
+        with self.assertRaises(ValueError):
+            User.resolve_fields(view='everything')
+        self.assertEqual(Media.resolve_fields(['path']), ('id', 'path'))
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,13 +1,21 @@
+import gzip
 import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
 from flask import url_for
-from app import create_app, db
+from app import create_app, db, cache, compression
+from app.caching import view_cache_key, wait_for_refreshes
 from app.models import User, Page, Tag, Role
+from app.ratelimit import CacheStorage
+from app.utils.db_utils import QueryBudgetExceeded
 from config import Config
 
 class TestConfig(Config):
     """Test configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite://'  # Use in-memory database for testing
+    QUERY_BUDGET = 50
+    QUERY_BUDGET_ACTION = 'raise'  # Fail tests of views running too many queries
     WTF_CSRF_ENABLED = False
 
 class RoutesTestCase(unittest.TestCase):
@@ -68,5 +76,282 @@ class RoutesTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.content_type, 'application/json')
 
+class CompressionTestCase(unittest.TestCase):
+    """Test case for response compression"""
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.app = create_app(TestConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_gzip_negotiation(self):
+        """Test that HTML is compressed only when the client accepts gzip"""
+        plain = self.client.get('/api-docs')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertIn('Accept-Encoding', plain.headers['Vary'])
+
+        response = self.client.get('/api-docs', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+
+        response = self.client.get('/api-docs', headers={'Accept-Encoding': 'gzip;q=0'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_small_responses_not_compressed(self):
+        """Test that bodies below the size threshold are sent as is"""
+        response = self.client.get('/api/tags', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_cached_view_compressed_once(self):
+        """Test that compressed bodies of cached views are reused"""
+        with patch('app.compression.compress', wraps=compression.compress) as compress:
+            for _ in range(3):
+                response = self.client.get('/api-docs', headers={'Accept-Encoding': 'gzip'})
+                self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(compress.call_count, 1)
+
+    def test_compressed_etag(self):
+        """Test that compressed variants get their own ETag and still revalidate"""
+        self.app.config['COMPRESS_MIN_SIZE'] = 10
+        response = self.client.get('/api/tags', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        etag = response.headers['ETag']
+        self.assertTrue(etag.endswith('-gzip"'))
+
+        response = self.client.get('/api/tags', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+
+class ViewCacheTestCase(unittest.TestCase):
+    """Test case for cached views"""
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.app = create_app(TestConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.user = User(username='author', email='author@example.com')
+        self.user.set_password('password')
+        db.session.add(self.user)
+        db.session.commit()
+
+        with self.app.test_request_context('/sitemap'):
+            self.lock_key = f"lock/{view_cache_key('anonymous')}"
+
+    def tearDown(self):
+        """Clean up after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_page(self, title):
+        """Publish a page"""
+        db.session.add(Page(title=title, slug=title.lower(), content=title, user_id=self.user.id,
+                            is_published=True, published_at=datetime.now(timezone.utc)))
+        db.session.commit()
+
+    def test_outdated_entry_served_while_rebuilding(self):
+        """Test that other workers serve the outdated entry while one rebuilds it"""
+        self.add_page('First')
+        self.assertIn(b'First', self.client.get('/sitemap').data)
+        self.add_page('Second')
+
+        # Another worker holds the rebuild lock
+        cache.add(self.lock_key, 1)
+        response = self.client.get('/sitemap')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'Second', response.data)
+
+        # Once the lock is free the sitemap is refreshed in the background
+        cache.delete(self.lock_key)
+        self.assertNotIn(b'Second', self.client.get('/sitemap').data)
+        wait_for_refreshes()
+        self.assertIn(b'Second', self.client.get('/sitemap').data)
+        self.assertIsNone(cache.get(self.lock_key))
+
+    def test_expired_entry_refreshed_in_background(self):
+        """Test that an expired entry is served while it is refreshed"""
+        self.add_page('First')
+        self.client.get('/sitemap')
+        with self.app.test_request_context('/sitemap'):
+            key = view_cache_key('anonymous')
+        expires = cache.get(key)['expires']
+
+        with patch('app.caching.time.time', return_value=expires + 1):
+            response = self.client.get('/sitemap')
+            self.assertIn(b'First', response.data)
+            wait_for_refreshes()
+        self.assertGreater(cache.get(key)['expires'], expires)
+
+    def test_missing_entry_waits_for_rebuild(self):
+        """Test that a miss waits for the lock holder and renders itself once the lock is gone"""
+        self.add_page('First')
+        cache.add(self.lock_key, 1)
+
+        with patch('app.caching.time.sleep', side_effect=lambda _: cache.delete(self.lock_key)) as sleep:
+            response = self.client.get('/sitemap')
+        sleep.assert_called_once()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'First', response.data)
+
+    def test_cache_warm(self):
+        """Test that warming builds the entries of pages and tags without counting against rate limits"""
+        self.add_page('First')
+        self.add_page('Second')
+        page = Page.query.filter_by(slug='first').one()
+        page.tags.append(Tag(name='News'))
+        db.session.commit()
+        self.app.config['RATELIMIT_ROUTES'] = {'content.page': '1/minute'}
+
+        result = self.app.test_cli_runner().invoke(args=['cache-warm', '--workers', '2'])
+        self.assertIn('Warmed 9 of 9 views', result.output)
+
+        for url in ('/', '/index', '/sitemap', '/content/pages', '/content/page/first', '/content/page/second',
+                    '/content/tag/News'):
+            with self.app.test_request_context(url):
+                self.assertIsNotNone(cache.get(view_cache_key('anonymous')), url)
+
+class QueryInstrumentationTestCase(unittest.TestCase):
+    """Test case for the slow query log and per-request query stats"""
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.app = create_app(TestConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_query_stats_header(self):
+        """Test that responses report their query count and database time"""
+        response = self.client.get('/api/pages')
+        self.assertGreater(int(response.headers['X-DB-Queries']), 0)
+        self.assertGreaterEqual(float(response.headers['X-DB-Time']), 0)
+
+        self.app.config['QUERY_STATS_HEADER'] = False
+        self.assertNotIn('X-DB-Queries', self.client.get('/api/pages').headers)
+
+    def test_query_budget(self):
+        """Test that requests over their endpoint's budget are reported or fail"""
+        self.app.config['QUERY_BUDGETS'] = {'api.get_pages': 0}
+        self.app.config['QUERY_BUDGET_ACTION'] = 'warn'
+        with self.assertLogs(self.app.logger, 'WARNING') as logs:
+            self.assertEqual(self.client.get('/api/pages').status_code, 200)
+        self.assertIn('api.get_pages ran', logs.output[0])
+
+        self.app.config['QUERY_BUDGET_ACTION'] = 'raise'
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/api/pages?limit=5')
+
+    def test_slow_query_log(self):
+        """Test that slow statements are logged with their parameter types, endpoint and caller"""
+        self.app.config['SLOW_DB_QUERY_TIME'] = 0
+        with self.assertLogs(self.app.logger, 'WARNING') as logs:
+            self.client.get('/api/pages?limit=5')
+        slow = [line for line in logs.output if 'Slow query' in line and 'LIMIT' in line][0]
+        self.assertIn('in api.get_pages', slow)
+        self.assertIn('Parameters: [int', slow)
+        self.assertIn('app/api.py', slow)
+
+class RateLimitTestCase(unittest.TestCase):
+    """Test case for request rate limiting"""
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.app = create_app(TestConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        # Freeze time at the start of a window
+        self.time_patch = patch('app.ratelimit.time.time', return_value=6000.0)
+        self.time_patch.start()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.time_patch.stop()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def assert_limited(self, url, allowed):
+        """Check that the given number of requests pass and the next one is rejected"""
+        for _ in range(allowed):
+            self.assertNotEqual(self.client.get(url).status_code, 429)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 429)
+        return response
+
+    def test_route_limit(self):
+        """Test a configured route limit with Retry-After on API responses"""
+        self.app.config['RATELIMIT_ROUTES'] = {'api.get_tags': '3/minute'}
+        response = self.assert_limited('/api/tags', 3)
+        self.assertEqual(response.headers['Retry-After'], '60')
+        self.assertEqual(response.get_json()['error'], 'Too many requests')
+
+        # Other routes are not affected
+        self.assertEqual(self.client.get('/api/pages').status_code, 200)
+
+    def test_blueprint_limit(self):
+        """Test a configured blueprint limit on HTML responses"""
+        self.app.config['RATELIMIT_BLUEPRINTS'] = {'main': '2/minute'}
+        response = self.assert_limited('/sitemap', 2)
+        self.assertIn('Retry-After', response.headers)
+        self.assertEqual(self.client.get('/api/tags').status_code, 200)
+
+    def test_shared_cache_storage(self):
+        """Test counters stored in the Flask cache"""
+        self.app.extensions['ratelimit_storage'] = CacheStorage()
+        self.app.config['RATELIMIT_ROUTES'] = {'api.get_tags': '2/minute'}
+        self.assert_limited('/api/tags', 2)
+
+    def test_forwarded_clients_limited_separately(self):
+        """Test that clients behind the trusted proxy get their own counters"""
+        with patch.object(Config, 'RATELIMIT_TRUSTED_PROXIES', 1):
+            app = create_app(TestConfig)
+        app.config['RATELIMIT_ROUTES'] = {'api.get_tags': '2/minute'}
+        client = app.test_client()
+
+        def get(address):
+            return client.get('/api/tags', headers={'X-Forwarded-For': address},
+                              environ_base={'REMOTE_ADDR': '127.0.0.1'})
+
+        with app.app_context():
+            db.create_all()
+            for _ in range(2):
+                self.assertEqual(get('203.0.113.1').status_code, 200)
+            self.assertEqual(get('203.0.113.1').status_code, 429)
+            self.assertEqual(get('203.0.113.2').status_code, 200)
+            db.drop_all()
+
+    def test_login_post_limit(self):
+        """Test that login attempts are limited but the form is not"""
+        for _ in range(10):
+            self.client.post('/auth/login', data={'email': 'x@example.com', 'password': 'wrong'})
+        response = self.client.post('/auth/login',
+                                    data={'email': 'x@example.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.client.get('/auth/login').status_code, 200)
+
 if __name__ == '__main__':
     unittest.main()
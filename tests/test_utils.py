@@ -2,12 +2,22 @@
 Test utilities for the application.
 """
 import base64
+import os
+import tempfile
 import unittest
 import socket
+import time
 from unittest.mock import patch, MagicMock
-from flask import session
+from flask import Flask, session
+from sqlalchemy import create_engine, text
 from app.models import User, Tag, Page
 from app.utils.port_utils import get_available_port
+from app.utils.token_cache import ApiPrincipal, TokenCache
+from app.ratelimit import MemoryStorage, parse_limit
+from app.utils.html_utils import render_content
+from app.sqlite_pragmas import get_pragmas, listen_for_connections
+from app.db_pool import configure_pool, pool_options
+from app.utils.db_utils import parameters_shape
 from datetime import datetime, timezone
 
 def login(client, email, password):
@@ -113,3 +123,188 @@ class PortUtilsTestCase(unittest.TestCase):
         mock_socket_instance1.close.assert_called_once()
         mock_socket_instance2.bind.assert_called_once_with(('127.0.0.1', 0))
         mock_socket_instance2.close.assert_called_once()
+
+
+class TokenCacheTestCase(unittest.TestCase):
+    """Test case for the verified token cache"""
+
+    def principal(self, user_id, role='user'):
+        """Create a principal for testing"""
+        return ApiPrincipal(user_id, role, [], True)
+
+    def test_get_and_set(self):
+        """Test caching a token until it expires"""
+        cache = TokenCache(maxsize=10, ttl=60)
+        cache.set('token', self.principal(1), time.time() + 3600)
+        self.assertEqual(cache.get('token').id, 1)
+        self.assertIsNone(cache.get('other'))
+
+    def test_expiry_capped_at_token_exp(self):
+        """Test that entries never outlive the token itself"""
+        cache = TokenCache(maxsize=10, ttl=60)
+        cache.set('expired', self.principal(1), time.time() - 1)
+        self.assertIsNone(cache.get('expired'))
+        self.assertEqual(len(cache), 0)
+
+    @patch('app.utils.token_cache.time.time')
+    def test_ttl(self, mock_time):
+        """Test that entries expire after the TTL"""
+        mock_time.return_value = 1000.0
+        cache = TokenCache(maxsize=10, ttl=60)
+        cache.set('token', self.principal(1), 5000.0)
+        mock_time.return_value = 1061.0
+        self.assertIsNone(cache.get('token'))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used token is evicted"""
+        cache = TokenCache(maxsize=2, ttl=60)
+        exp = time.time() + 3600
+        cache.set('a', self.principal(1), exp)
+        cache.set('b', self.principal(2), exp)
+        cache.get('a')
+        cache.set('c', self.principal(3), exp)
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+
+    def test_invalidate_user(self):
+        """Test dropping every token of one user"""
+        cache = TokenCache(maxsize=10, ttl=60)
+        exp = time.time() + 3600
+        cache.set('a1', self.principal(1), exp)
+        cache.set('a2', self.principal(1), exp)
+        cache.set('b', self.principal(2), exp)
+        cache.invalidate_user(1)
+        self.assertIsNone(cache.get('a1'))
+        self.assertIsNone(cache.get('a2'))
+        self.assertIsNotNone(cache.get('b'))
+
+    def test_principal_is_admin(self):
+        """Test admin detection from the role column and the roles relation"""
+        self.assertTrue(ApiPrincipal(1, 'admin', [], True).is_admin())
+        self.assertTrue(ApiPrincipal(1, 'user', ['admin'], True).is_admin())
+        self.assertFalse(ApiPrincipal(1, 'user', ['user'], True).is_admin())
+
+
+class RateLimitUtilsTestCase(unittest.TestCase):
+    """Test case for rate limit parsing and counter storage"""
+
+    def test_parse_limit(self):
+        """Test parsing limit strings"""
+        self.assertEqual(parse_limit('10/minute'), (10, 60))
+        self.assertEqual(parse_limit('100 per hour'), (100, 3600))
+        self.assertEqual(parse_limit('5/30 seconds'), (5, 30))
+        with self.assertRaises(ValueError):
+            parse_limit('lots')
+
+    def test_memory_storage_windows(self):
+        """Test that counts roll over into the previous window and then reset"""
+        storage = MemoryStorage()
+        self.assertEqual(storage.hit('client', 10, 60), (1, 0))
+        self.assertEqual(storage.hit('client', 10, 60), (2, 0))
+        self.assertEqual(storage.hit('client', 11, 60), (1, 2))
+        self.assertEqual(storage.hit('client', 13, 60), (1, 0))
+        self.assertEqual(storage.hit('other', 13, 60), (1, 0))
+
+    def test_memory_storage_evicts_least_recently_used(self):
+        """Test that the storage stays at max_keys by dropping the least recently used counters"""
+        storage = MemoryStorage(max_keys=2)
+        storage.hit('a', 1, 60)
+        storage.hit('b', 1, 60)
+        storage.hit('a', 1, 60)
+        storage.hit('c', 1, 60)
+        self.assertEqual(list(storage._counters), ['a', 'c'])
+        for key in range(100):
+            storage.hit(key, 1, 60)
+        self.assertEqual(len(storage._counters), 2)
+
+class ContentRenderingTestCase(unittest.TestCase):
+    """Test case for rendering page content"""
+
+    def test_sanitizes_content(self):
+        """Test that scripts, event handlers and unsafe links are removed"""
+        html, _, _ = render_content(
+            '<p onclick="steal()">Hi <script>alert(1)</script><b>there</p>'
+            '<a href=" javascript:alert(1)" target="_blank">link</a><a href="/about">about</a>'
+            '<iframe src="https://example.com"><p>inside</p></iframe><style>p {}</style>')
+        self.assertEqual(html, '<p>Hi <b>there</b></p><a target="_blank" rel="noopener noreferrer">link</a>'
+                               '<a href="/about">about</a>')
+
+    def test_heading_anchors_and_lazy_images(self):
+        """Test that headings get unique ids and images load lazily"""
+        html, _, _ = render_content('<h2>Getting Started!</h2><h2>Getting started</h2>'
+                                    '<h3 id="custom">Custom</h3><img src="a.png" alt="A &amp; B">')
+        self.assertEqual(html, '<h2 id="getting-started">Getting Started!</h2>'
+                               '<h2 id="getting-started-2">Getting started</h2>'
+                               '<h3 id="custom">Custom</h3>'
+                               '<img src="a.png" alt="A &amp; B" loading="lazy" decoding="async">')
+
+    def test_word_count_and_reading_time(self):
+        """Test that only the visible text is counted"""
+        _, words, minutes = render_content('<p>It&rsquo;s <em>four</em> words here</p><script>var a, b;</script>')
+        self.assertEqual((words, minutes), (4, 1))
+        self.assertEqual(render_content('<p>word </p>' * 450)[1:], (450, 3))
+        self.assertEqual(render_content(''), ('', 0, 0))
+
+class SQLitePragmasTestCase(unittest.TestCase):
+    """Test case for the SQLite pragma profiles"""
+
+    def test_get_pragmas(self):
+        """Test profiles, overrides and validation"""
+        self.assertEqual(get_pragmas('default'), {})
+        pragmas = get_pragmas('concurrent', {'busy_timeout': 10000})
+        self.assertEqual((pragmas['journal_mode'], pragmas['busy_timeout']), ('WAL', 10000))
+        self.assertEqual(get_pragmas('durable')['synchronous'], 'FULL')
+        with self.assertRaises(ValueError):
+            get_pragmas('fast')
+        with self.assertRaises(ValueError):
+            get_pragmas('default', {'journal_mode': 'WAL; DROP TABLE page'})
+
+    def test_pragmas_applied_on_connect(self):
+        """Test that every connection of the engine gets the profile"""
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine('sqlite:///' + os.path.join(directory, 'test.db'))
+            listen_for_connections(engine, get_pragmas('concurrent'))
+            with engine.connect() as connection:
+                self.assertEqual(connection.execute(text('PRAGMA journal_mode')).scalar(), 'wal')
+                self.assertEqual(connection.execute(text('PRAGMA synchronous')).scalar(), 1)  # NORMAL
+                self.assertEqual(connection.execute(text('PRAGMA busy_timeout')).scalar(), 5000)
+                self.assertEqual(connection.execute(text('PRAGMA temp_store')).scalar(), 2)  # MEMORY
+            engine.dispose()
+
+class DBPoolTestCase(unittest.TestCase):
+    """Test case for the per-worker connection pool sizing"""
+
+    def test_pool_options(self):
+        """Test that the connection budget is divided between the workers"""
+        config = {'SQLALCHEMY_DATABASE_URI': 'postgresql://app@db/app', 'DB_WORKERS': 9,
+                  'DB_MAX_CONNECTIONS': 100, 'DB_RESERVED_CONNECTIONS': 5, 'DB_POOL_SIZE': 5}
+        options = pool_options(config)
+        self.assertEqual((options['pool_size'], options['max_overflow']), (5, 5))
+        self.assertTrue(options['pool_pre_ping'])
+
+        config['DB_WORKERS'] = 40
+        options = pool_options(config)
+        self.assertEqual((options['pool_size'], options['max_overflow']), (2, 0))
+
+        config['DB_WORKERS'] = 200
+        self.assertEqual(pool_options(config)['pool_size'], 1)
+        self.assertEqual(pool_options({'SQLALCHEMY_DATABASE_URI': 'sqlite:///app.db'}), {})
+
+    def test_explicit_engine_options_kept(self):
+        """Test that SQLALCHEMY_ENGINE_OPTIONS overrides the computed options"""
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI='postgresql://app@db/app',
+                          SQLALCHEMY_ENGINE_OPTIONS={'pool_recycle': 300})
+        configure_pool(app)
+        self.assertEqual(app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_recycle'], 300)
+        self.assertEqual(app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_size'], 5)
+
+class QueryInstrumentationUtilsTestCase(unittest.TestCase):
+    """Test case for describing logged statements"""
+
+    def test_parameters_shape(self):
+        """Test that parameters are described by their types only"""
+        self.assertEqual(parameters_shape((1, 'secret', None)), '[int, str, NoneType]')
+        self.assertEqual(parameters_shape({'email': 'a@example.com'}), {'email': 'str'})
+        self.assertEqual(parameters_shape([(1, 2), (3, 4)], executemany=True), '2 x [int, int]')